@@ -0,0 +1,256 @@
+"""
+Timing and peak-memory benchmarks for the hot paths of lcEnhance.
+
+Measures import time in fresh interpreters, sweeps ticksinper and numper over several orders of magnitude, writes
+the results as JSON and compares them with a stored baseline so that regressions stand out.
+
+    python Benchmark_suite.py                      # full sweep, compared with benchmark_baseline.json
+    python Benchmark_suite.py --quick              # small sizes only
+    python Benchmark_suite.py --update-baseline    # store this run as the new baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import lcEnhance.LCE as lce
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+def measure(func, setup, repeat):
+    """
+    Times func and measures its peak traced memory
+
+    Args:
+        func (callable): Benchmarked call, takes the value returned by setup
+        setup (callable): Builds the argument of func, not timed
+        repeat (integer): Number of timed runs, the best one is kept
+
+    Returns:
+        dict: Best wall time in seconds and peak memory in bytes
+
+    """
+
+    times = []
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+
+    #separate run for memory, since tracing slows everything down
+
+    arg = setup()
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": peak}
+
+def measure_startup(code, repeat):
+    """
+    Times code in a fresh interpreter, for import costs that only show up once per process
+
+    Args:
+        code (string): Python code to run after the timer starts
+        repeat (integer): Number of fresh interpreters, the best one is kept
+
+    Returns:
+        dict: Best wall time in seconds and peak memory in bytes
+
+    """
+
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    def fresh(script):
+        return subprocess.run([sys.executable, "-c", script], cwd = root, capture_output = True, text = True,
+                              check = True).stdout
+
+    times = [float(fresh("import time; start = time.perf_counter(); " + code +
+                         "; print(time.perf_counter() - start)")) for _ in range(repeat)]
+
+    #separate run for memory, since tracing slows imports down a lot
+
+    peak = int(fresh("import tracemalloc; tracemalloc.start(); " + code +
+                     "; print(tracemalloc.get_traced_memory()[1])"))
+    return {"seconds": min(times), "peak_bytes": peak}
+
+#startup benchmarks, each run in a fresh interpreter
+
+STARTUP = {
+    "import lcEnhance.LCE": "import lcEnhance.LCE",
+    "import + first LightCurveTheoretical": "import lcEnhance.LCE as lce; lce.LightCurveTheoretical(seed = 0).generate()",
+    "import + first LightCurveExoplanet": ("import lcEnhance.LCE as lce; "
+                                           "lce.LightCurveExoplanet(lce.Exoplanet(1, .05), lce.Star(1), seed = 0).generate()"),
+}
+
+def benchmarks(sizes, max_plot_length):
+    """
+    Lists every benchmark of the sweep
+
+    Args:
+        sizes (list of tuple): (ticksinper, numper) pairs to sweep
+        max_plot_length (integer): Longest light curve to benchmark plotting on, scatter plots get very slow
+
+    Yields:
+        string: Name of the benchmark
+        dict: Parameters of the benchmark
+        callable: Setup of the benchmark
+        callable: Benchmarked call
+
+    """
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    planet = lce.Exoplanet(1, 0.05)
+    star = lce.Star(1)
+
+    #figures are drawn to include the rendering, which is where scatter plots spend their time
+
+    def plotted(lc):
+        lc.plot()
+        plt.gcf().canvas.draw()
+        plt.close("all")
+
+    def transit_plotted(lc):
+        lc.plot_transit()
+        plt.gcf().canvas.draw()
+        plt.close("all")
+
+    def decimated(lc):
+        lc.plot(decimate = True)
+        plt.gcf().canvas.draw()
+        plt.close("all")
+
+    for ticksinper, numper in sizes:
+        params = {"ticksinper": ticksinper, "numper": numper}
+
+        def theoretical(ticksinper = ticksinper, numper = numper):
+            return lce.LightCurveTheoretical(ticksinper = ticksinper, numper = numper, seed = 0)
+
+        def exoplanet(ticksinper = ticksinper, numper = numper):
+            return lce.LightCurveExoplanet(planet, star, ticksinper = ticksinper, numper = numper, seed = 0)
+
+        def generated(ticksinper = ticksinper, numper = numper):
+            lc = theoretical(ticksinper, numper)
+            lc.generate()
+            return lc
+
+        yield "LightCurveTheoretical.__init__", params, lambda: None, lambda _, f = theoretical: f()
+        yield "LightCurveExoplanet.__init__", params, lambda: None, lambda _, f = exoplanet: f()
+        yield "generate", params, theoretical, lambda lc: lc.generate()
+        if ticksinper * numper <= max_plot_length:
+            yield "plot_transit", params, theoretical, transit_plotted
+            yield "plot", params, generated, plotted
+        yield "plot decimated", params, generated, decimated
+
+        def zoomable(ticksinper = ticksinper, numper = numper):
+            lc = generated(ticksinper, numper)
+            lc.envelope(1500)
+            return lc
+
+        yield "envelope zoom", params, zoomable, lambda lc, numper = numper: lc.envelope(1500, xlim = [numper/2, numper/2 + .1])
+
+def run(sizes, repeat, max_plot_length):
+    """
+    Runs the whole sweep
+
+    Args:
+        sizes (list of tuple): (ticksinper, numper) pairs to sweep
+        repeat (integer): Number of timed runs of each benchmark
+        max_plot_length (integer): Longest light curve to benchmark plotting on
+
+    Returns:
+        dict: Machine description and one result per benchmark
+
+    """
+
+    results = []
+    for name, code in STARTUP.items():
+        result = {"name": name, "params": {}}
+        result.update(measure_startup(code, repeat))
+        results.append(result)
+        print(f"{name:51s} {result['seconds'] * 1e3:10.3f} ms {result['peak_bytes'] / 2**20:10.2f} MiB")
+    for name, params, setup, func in benchmarks(sizes, max_plot_length):
+        result = {"name": name, "params": params}
+        result.update(measure(func, setup, repeat))
+        results.append(result)
+        print(f"{name:32s} {params['ticksinper']:>8d} x {params['numper']:<6d} "
+              f"{result['seconds'] * 1e3:10.3f} ms {result['peak_bytes'] / 2**20:10.2f} MiB")
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "results": results}
+
+def compare(current, baseline, threshold, min_seconds = 1e-3):
+    """
+    Compares a run with the baseline
+
+    Args:
+        current (dict): Results of this run
+        baseline (dict): Stored baseline results
+        threshold (float): Allowed relative slowdown or memory growth before a result counts as a regression
+        min_seconds (float, default = 1e-3): Timings faster than this in the baseline are too noisy to compare
+
+    Returns:
+        list of string: Description of every regression
+
+    """
+
+    def key(result):
+        return result["name"], tuple(sorted(result["params"].items()))
+
+    stored = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = stored.get(key(result))
+        if old is None:
+            continue
+        for field, floor in (("seconds", min_seconds), ("peak_bytes", 1)):
+            if old[field] >= floor and result[field] > old[field] * (1 + threshold):
+                regressions.append(f"{result['name']} {result['params']}: {field} "
+                                   f"{old[field]:.4g} -> {result[field]:.4g} ({result[field] / old[field]:.2f}x)")
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action = "store_true", help = "only sweep the small sizes")
+    parser.add_argument("--repeat", type = int, default = 3, help = "timed runs per benchmark")
+    parser.add_argument("--max-plot-length", type = int, default = 10**5, help = "longest curve to plot")
+    parser.add_argument("--output", help = "write the results to this JSON file")
+    parser.add_argument("--baseline", default = BASELINE, help = "baseline JSON file to compare with")
+    parser.add_argument("--update-baseline", action = "store_true", help = "store this run as the baseline")
+    parser.add_argument("--threshold", type = float, default = .25, help = "allowed relative regression")
+    args = parser.parse_args(argv)
+
+    ticks = (100, 1000) if args.quick else (100, 1000, 10000)
+    periods = (1, 10) if args.quick else (1, 10, 100, 1000)
+    sizes = [(t, n) for t in ticks for n in periods if t * n <= 10**7]
+
+    current = run(sizes, args.repeat, args.max_plot_length)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent = 1)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent = 1)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --update-baseline to store one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(current, json.load(f), args.threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,19 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import astropy.units as u
 import lcEnhance.LCE as lce
+from lcEnhance import cli, export
+from lcEnhance.bls import bls_search
+from lcEnhance.cache import LightCurveCache
+from lcEnhance.phasefold import PhaseFoldAccumulator, phase_fold, stream_fold
+from lcEnhance.population import TransitPopulation, simulate_population
 
 class TestTransitSimulation(unittest.TestCase):
     def setUp(self):
@@ -37,5 +49,681 @@ class TestTransitSimulation(unittest.TestCase):
         except Exception as e:
             self.fail(f"Phase-folded plot raised an exception: {e}")
 
+def loop_transit(lc):
+    """Reference copy of the original per-period loop in plot_transit."""
+    flux = lc.fluxOG - 1
+    depth = lc.depth
+    for per in range(lc.numper):
+        lb = int(lc.ticksinper/2 * (1 + 2 * per) - lc.duration/2)
+        ub = int(lc.ticksinper/2 * (1 + 2 * per) + lc.duration/2)
+        flux[lb:ub] -= depth
+        for i in np.arange(lb - lc.slopelength, lb):
+            flux[i] = 1 - (i - (lb - lc.slopelength))/(lc.slopelength) * (depth)
+        for i in np.arange(ub, lc.slopelength + ub):
+            flux[i] = 1 + (i - (ub + lc.slopelength))/(lc.slopelength) * (depth)
+        depth = lc.rng.normal(loc=depth, scale=0.0001, size=1)[0]
+    return np.roll(flux, lc.location), depth
+
+class TestVectorizedTransits(unittest.TestCase):
+    def check_matches_loop(self, make):
+        expected, expected_depth = loop_transit(make())
+        lc = make()
+        _, flux = lc.plot_transit()
+        np.testing.assert_array_equal(flux, expected)
+        self.assertEqual(lc.depth, expected_depth)
+
+    def test_theoretical_matches_loop(self):
+        self.check_matches_loop(lambda: lce.LightCurveTheoretical(ticksinper=97, numper=25, seed=42))
+
+    def test_exoplanet_matches_loop(self):
+        self.check_matches_loop(lambda: lce.LightCurveExoplanet(lce.Exoplanet(1, 0.03), lce.Star(1), ticksinper=1000,
+                                                                numper=10, seed=7))
+
+    def test_overlapping_slopes_match_loop(self):
+        #the egress of one period runs into the ingress of the next, and the first ingress wraps to the end
+        for seed in (0, 5):
+            self.check_matches_loop(lambda: lce.LightCurveTheoretical(ticksinper=100, duration=.85, numper=4,
+                                                                      seed=seed))
+
+class TestGenerate(unittest.TestCase):
+    def test_generate_matches_plot_transit(self):
+        timesteps, flux = lce.LightCurveTheoretical(numper=5, seed=3).generate()
+        timesteps2, flux2 = lce.LightCurveTheoretical(numper=5, seed=3).plot_transit()
+        np.testing.assert_array_equal(timesteps, timesteps2)
+        np.testing.assert_array_equal(flux, flux2)
+
+    def test_generate_does_not_import_pyplot(self):
+        code = ("import sys, lcEnhance.LCE as lce; "
+                "lce.LightCurveTheoretical(numper=3).generate(); "
+                "sys.exit('matplotlib.pyplot' in sys.modules)")
+        self.assertEqual(subprocess.run([sys.executable, "-c", code]).returncode, 0)
+
+class TestPopulation(unittest.TestCase):
+    def test_flux_matrix_shape(self):
+        population = TransitPopulation(np.full(6, .05), np.full(6, .1), ticksinper=50, numper=3, seed=0)
+        timesteps, flux = population.generate()
+        self.assertEqual(flux.shape, (6, 150))
+        self.assertEqual(len(timesteps), 150)
+
+    def test_rows_match_single_curves(self):
+        lc = lce.LightCurveTheoretical(ticksinper=200, depth=.05, duration=.1, noise=0, numper=4, seed=0)
+        _, flux = lc.generate()
+        population = TransitPopulation([.05, .1], [.1, .12], locations=[lc.location, 5], noises=0,
+                                       ticksinper=200, numper=4, seed=1)
+        _, matrix = population.generate()
+        np.testing.assert_allclose(matrix[0], flux, atol=1e-3)
+
+    def test_parallel_independent_of_processes(self):
+        depths = np.linspace(.01, .2, 7)
+        _, flux1, loc1 = simulate_population(depths, .1, ticksinper=40, numper=3, seed=5, processes=1, batch_size=7)
+        _, flux2, loc2 = simulate_population(depths, .1, ticksinper=40, numper=3, seed=5, processes=2, batch_size=2)
+        np.testing.assert_array_equal(flux1, flux2)
+        np.testing.assert_array_equal(loc1, loc2)
+
+    def test_parallel_matches_serial_streams(self):
+        depths = np.linspace(.01, .2, 4)
+        _, flux, locations = simulate_population(depths, .1, ticksinper=40, numper=3, seed=5, processes=2, batch_size=3)
+        population = TransitPopulation(depths, .1, ticksinper=40, numper=3, seed=np.random.SeedSequence(5).spawn(4))
+        population.generate()
+        np.testing.assert_array_equal(population.flux, flux)
+        np.testing.assert_array_equal(population.locations, locations)
+
+class TestStream(unittest.TestCase):
+    def check_stream_matches_generate(self, make, chunksize):
+        timesteps, flux = make().generate()
+        chunks = list(make().stream(chunksize))
+        self.assertTrue(all(len(f) <= chunksize for _, f in chunks))
+        np.testing.assert_array_equal(np.concatenate([t for t, _ in chunks]), timesteps)
+        np.testing.assert_array_equal(np.concatenate([f for _, f in chunks]), flux)
+
+    def test_chunks_match_generate(self):
+        make = lambda: lce.LightCurveTheoretical(ticksinper=100, duration=.14, numper=7, seed=11)
+        for chunksize in (1, 37, 100, 700, 5000):
+            self.check_stream_matches_generate(make, chunksize)
+
+    def test_wrapped_transit_split_across_chunks(self):
+        def make():
+            lc = lce.LightCurveTheoretical(ticksinper=100, duration=.14, numper=3, seed=2)
+            lc.location = 95
+            return lc
+        self.check_stream_matches_generate(make, 40)
+        self.check_stream_matches_generate(make, 300)
+
+    def test_ingress_before_start_wraps_into_every_window(self):
+        #long transits with a small shift start before sample 0, their ingress wraps to the end of the light curve
+        def make():
+            lc = lce.LightCurveTheoretical(ticksinper=100, duration=.95, numper=20, noise=0, seed=3)
+            lc.location = 1
+            return lc
+        _, whole = make().generate(chunksize=2000)
+        for chunksize in (1, 37, 100, 700):
+            np.testing.assert_array_equal(make().generate(chunksize=chunksize)[1], whole)
+            self.check_stream_matches_generate(make, chunksize)
+
+class TestMemmap(unittest.TestCase):
+    def test_memmap_matches_generate(self):
+        timesteps, flux = lce.LightCurveTheoretical(ticksinper=100, duration=.1, numper=6, seed=4).generate()
+        lc = lce.LightCurveTheoretical(ticksinper=100, duration=.1, numper=6, seed=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "curve.npy")
+            lc.generate(filename=filename, chunksize=64)
+            self.assertIsInstance(lc.flux, np.memmap)
+            del lc.timesteps, lc.flux
+            timesteps2, flux2 = lce.load_lightcurve(filename)
+            self.assertIsInstance(flux2, np.memmap)
+            np.testing.assert_array_equal(timesteps2, timesteps)
+            np.testing.assert_array_equal(flux2[150:350], flux[150:350])
+            del timesteps2, flux2
+
+    def test_flux_file_is_contiguous(self):
+        lc = lce.LightCurveTheoretical(ticksinper=100, numper=5, seed=4, dtype=np.float32)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "curve.npy")
+            timesteps, flux = lc.generate(filename=filename)
+            flux2 = np.load(filename, mmap_mode='r')
+            self.assertEqual((flux2.dtype, flux2.shape), (np.dtype(np.float32), (500,)))
+            self.assertTrue(flux2.flags.c_contiguous)
+            expected = np.arange(500)/100
+            np.testing.assert_array_equal(timesteps[120:130], expected[120:130])
+            np.testing.assert_array_equal(timesteps[[-1, 3]], expected[[-1, 3]])
+            np.testing.assert_array_equal(lce.load_lightcurve(filename)[0][::7], expected[::7])
+            del flux, flux2, lc.flux
+
+class TestSeeds(unittest.TestCase):
+    def test_stored_seed_regenerates_curve(self):
+        lc = lce.LightCurveTheoretical(numper=4)
+        _, flux = lc.generate()
+        _, flux2 = lce.LightCurveTheoretical(numper=4, seed=lc.seed).generate()
+        np.testing.assert_array_equal(flux, flux2)
+
+    def test_global_state_untouched(self):
+        state = np.random.get_state()
+        lce.LightCurveExoplanet(lce.Exoplanet(1, 0.05), lce.Star(1), numper=3, seed=1).generate()
+        np.testing.assert_array_equal(np.random.get_state()[1], state[1])
+
+    def test_threads_reproducible(self):
+        def run(seed):
+            return lce.LightCurveTheoretical(ticksinper=500, numper=20, seed=seed).generate()[1]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            fluxes = list(pool.map(run, range(8)))
+        for seed, flux in enumerate(fluxes):
+            np.testing.assert_array_equal(flux, run(seed))
+
+class TestLazyBaseline(unittest.TestCase):
+    def test_construction_does_not_draw_noise(self):
+        lc = lce.LightCurveTheoretical(ticksinper=1000, numper=1000, seed=0)
+        self.assertIsNone(lc._fluxOG)
+        self.assertEqual(lc.depth, lce.LightCurveTheoretical(ticksinper=1000, numper=1000, seed=0).depth)
+
+    def test_baseline_cached_and_reproducible(self):
+        lc = lce.LightCurveTheoretical(numper=3, seed=8)
+        self.assertIs(lc.fluxOG, lc.fluxOG)
+        np.testing.assert_array_equal(lc.fluxOG, lce.LightCurveTheoretical(numper=3, seed=8).fluxOG)
+
+    def test_custom_baseline(self):
+        lc = lce.LightCurveTheoretical(depth=.1, duration=.1, numper=2, seed=8)
+        lc.fluxOG = np.full(lc.length, 2.0)
+        _, flux = lc.generate()
+        self.assertEqual(flux.max(), 1)
+        self.assertAlmostEqual(flux.min(), .9, places=3)
+
+class TestDtype(unittest.TestCase):
+    def test_float32_within_tolerance(self):
+        _, flux64 = lce.LightCurveTheoretical(ticksinper=200, numper=20, seed=9).generate()
+        lc = lce.LightCurveTheoretical(ticksinper=200, numper=20, seed=9, dtype=np.float32)
+        _, flux32 = lc.generate()
+        self.assertEqual(flux32.dtype, np.float32)
+        self.assertEqual(lc.fluxOG.dtype, np.float32)
+        np.testing.assert_allclose(flux32, flux64, rtol=0, atol=1e-6)
+
+    def test_float32_stream_matches_generate(self):
+        make = lambda: lce.LightCurveExoplanet(lce.Exoplanet(1, 0.01), lce.Star(1), numper=9, seed=3, dtype=np.float32)
+        _, flux = make().generate()
+        chunks = [f for _, f in make().stream(150)]
+        self.assertEqual(chunks[0].dtype, np.float32)
+        np.testing.assert_array_equal(np.concatenate(chunks), flux)
+
+class TestOutBuffer(unittest.TestCase):
+    def test_out_buffer_filled_in_place(self):
+        lc = lce.LightCurveTheoretical(ticksinper=100, numper=50, seed=6)
+        out = np.empty(lc.length)
+        _, flux = lc.generate(out=out)
+        self.assertIs(flux, out)
+        _, expected = lce.LightCurveTheoretical(ticksinper=100, numper=50, seed=6).generate()
+        np.testing.assert_array_equal(out, expected)
+
+    def test_regeneration_allocates_no_full_arrays(self):
+        lc = lce.LightCurveTheoretical(ticksinper=1000, numper=1000, seed=6)
+        out = np.empty(lc.length)
+        lc.generate(out=out, chunksize=10000)
+        tracemalloc.start()
+        lc.generate(out=out, chunksize=10000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, out.nbytes / 10)
+
+    def test_first_generation_stores_no_timesteps(self):
+        lc = lce.LightCurveTheoretical(ticksinper=1000, numper=1000, seed=6, dtype=np.float32)
+        out = np.empty(lc.length, dtype=np.float32)
+        tracemalloc.start()
+        timesteps, _ = lc.generate(out=out, chunksize=10000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertLess(peak, out.nbytes / 4)
+        np.testing.assert_array_equal(timesteps[[0, 12345, -1]], np.array([0, 12345, lc.length - 1]) / 1000)
+
+class TestUnitFreePath(unittest.TestCase):
+    def test_si_floats_match_astropy(self):
+        for rad, a, rad_unit, a_unit in ((1, 0.05, "R_J", "AU"), (2.5, 0.1, "R_earth", "AU"), (7e7, 7.5e9, "m", "m")):
+            planet = lce.Exoplanet(rad, a, rad_unit=rad_unit, a_unit=a_unit)
+            self.assertIsInstance(planet.radius_m, float)
+            self.assertAlmostEqual(planet.radius_m, planet.radius.to_value(u.m), delta=1e-9 * planet.radius_m)
+            self.assertAlmostEqual(planet.a_m, planet.a.to_value(u.m), delta=1e-9 * planet.a_m)
+        star = lce.Star(1.3)
+        self.assertAlmostEqual(star.radius_m, star.radius.to_value(u.m), delta=1e-9 * star.radius_m)
+
+    def test_depth_and_duration_match_astropy(self):
+        planet = lce.Exoplanet(3, 0.02, rad_unit="R_earth")
+        star = lce.Star(0.8)
+        lc = lce.LightCurveExoplanet(planet, star, ticksinper=1000, seed=0)
+        self.assertAlmostEqual(lc.depth, float(((planet.radius / star.radius).to(''))**2), places=12)
+        self.assertAlmostEqual(lc.duration, float((star.radius / (planet.a * 2 * np.pi)).to('') * 1000), places=9)
+
+class TestAssignedUnits(unittest.TestCase):
+    def test_assigned_radius_reaches_light_curve(self):
+        planet, star = lce.Exoplanet(1, .05), lce.Star(1)
+        depth = lce.LightCurveExoplanet(planet, star, seed=0).depth
+        planet.radius = 2 * planet.radius
+        planet.a = planet.a.to(u.m)
+        star.radius = star.radius * 1
+        self.assertAlmostEqual(planet.radius.to_value(u.R_jup), 2)
+        self.assertAlmostEqual(planet.a_m / 1.495978707e11, .05)
+        self.assertAlmostEqual(lce.LightCurveExoplanet(planet, star, seed=0).depth, 4 * depth)
+
+class TestCatalogs(unittest.TestCase):
+    def test_catalog_matches_single_objects(self):
+        radii = np.array([1, 2.5, 11])
+        axes = np.array([0.05, 0.1, 0.02])
+        stars = lce.StarCatalog([1, 0.8, 1.2])
+        planets = lce.PlanetCatalog(radii, axes, rad_unit="R_earth")
+        self.assertEqual(len(planets), 3)
+        depths = planets.depths(stars)
+        durations = planets.durations(stars, ticksinper=100)
+        for i in range(3):
+            lc = lce.LightCurveExoplanet(lce.Exoplanet(radii[i], axes[i], rad_unit="R_earth"),
+                                         lce.Star(stars.radius_m[i] / lce.Star(1).radius_m), seed=0)
+            self.assertAlmostEqual(depths[i], lc.depth, places=12)
+            self.assertAlmostEqual(durations[i], lc.duration, places=9)
+
+    def test_catalog_feeds_population(self):
+        planets = lce.PlanetCatalog([1, 1.2], 0.05)
+        star = lce.Star(1)
+        population = TransitPopulation(planets.depths(star), planets.durations(star), ticksinper=100, seed=0)
+        self.assertEqual(population.generate()[1].shape, (2, 100))
+
+    def test_bad_units(self):
+        with self.assertRaises(Exception):
+            lce.PlanetCatalog([1], [1], rad_unit="pc")
+        with self.assertRaises(Exception):
+            lce.PlanetCatalog([1], [1], a_unit="pc")
+
+class TestCache(unittest.TestCase):
+    def make(self, seed):
+        return lce.LightCurveTheoretical(ticksinper=100, numper=5, seed=seed)
+
+    def test_hit_matches_generate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LightCurveCache(tmp)
+            first = self.make(1)
+            _, flux = cache.generate(first)
+            _, flux_again = first.generate()
+            second = self.make(1)
+            _, cached = cache.generate(second)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            np.testing.assert_array_equal(cached, flux)
+            reference = self.make(1)
+            reference.generate()
+            self.assertEqual(second.depth, reference.depth)
+            np.testing.assert_array_equal(second.generate()[1], flux_again)
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LightCurveCache(tmp)
+            cache.generate(self.make(1))
+            cache.generate(self.make(2))
+            paths = {seed: os.path.join(tmp, cache.key(self.make(seed)) + ".npz") for seed in (1, 2, 3)}
+            os.utime(paths[1], (1000, 1000))
+            os.utime(paths[2], (2000, 2000))
+            cache.generate(self.make(1))
+            cache.max_bytes = os.path.getsize(paths[1]) * 5 // 2
+            cache.generate(self.make(3))
+            self.assertTrue(os.path.exists(paths[1]))
+            self.assertFalse(os.path.exists(paths[2]))
+            self.assertTrue(os.path.exists(paths[3]))
+
+class TestTemplates(unittest.TestCase):
+    def test_shared_shape_reuses_template(self):
+        lce._transit_template.cache_clear()
+        for seed in range(4):
+            lce.LightCurveTheoretical(ticksinper=120, depth=.01 * (seed + 1), duration=.1, numper=3, seed=seed).generate()
+        info = lce._transit_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 3))
+
+    def test_template_matches_general_injection(self):
+        lc = lce.LightCurveTheoretical(ticksinper=100, duration=.13, numper=6, seed=12)
+        lb, ub = lce._transit_bounds(100, lc.duration, 6)
+        depths = np.linspace(.05, .06, 6)
+        general = np.ones(600)
+        lce._inject_transits(general, lb, ub, lc.slopelength, depths, shift=lc.location)
+        templated = np.ones(600)
+        lce._inject_template(templated, lce._transit_template(100, lc.duration, lc.slopelength), np.arange(6) * 100,
+                             depths, shift=lc.location)
+        np.testing.assert_array_equal(templated, general)
+
+    def test_template_matches_general_injection_with_overlapping_slopes(self):
+        lc = lce.LightCurveTheoretical(ticksinper=100, duration=.85, numper=4, seed=5)
+        lb, ub = lce._transit_bounds(100, lc.duration, 4)
+        depths = np.linspace(.05, .06, 4)
+        general = np.ones(400)
+        lce._inject_transits(general, lb, ub, lc.slopelength, depths, shift=lc.location)
+        templated = np.ones(400)
+        lce._inject_template(templated, lce._transit_template(100, lc.duration, lc.slopelength), np.arange(4) * 100,
+                             depths, shift=lc.location)
+        np.testing.assert_array_equal(templated, general)
+
+class TestProfiler(unittest.TestCase):
+    def test_stages_recorded(self):
+        records = []
+        with lce.Profiler(callback=lambda stage, record: records.append(stage), memory=True) as profiler:
+            lc = lce.LightCurveTheoretical(ticksinper=100, numper=30, seed=0)
+            lc.plot_transit()
+            lc.generate(chunksize=1000)
+        for stage in ("__init__", "generate", "noise", "inject", "plot", "transits", "scatter"):
+            self.assertIn(stage, profiler.stages)
+        self.assertEqual(profiler.stages["generate"]["calls"], 2)
+        self.assertEqual(profiler.stages["noise"]["calls"], 4)
+        self.assertGreater(profiler.stages["generate"]["bytes"], 0)
+        self.assertEqual(len(records), sum(s["calls"] for s in profiler.stages.values()))
+
+    def test_peak_counts_freed_temporaries(self):
+        #the baseline of every window is built from temporaries that are freed before the stage ends
+        with lce.Profiler(memory=True) as profiler:
+            lce.LightCurveTheoretical(ticksinper=1000, numper=100, seed=0).generate(chunksize=10000)
+        noise = profiler.stages["noise"]
+        self.assertEqual(noise["calls"], 10)
+        self.assertLess(abs(noise["bytes"]), 10000 * 8)
+        self.assertGreaterEqual(noise["peak"], 10000 * 8 * 2)
+        self.assertGreaterEqual(profiler.stages["generate"]["peak"], noise["peak"])
+
+    def test_inactive_outside_context(self):
+        with lce.Profiler() as profiler:
+            pass
+        lce.LightCurveTheoretical(seed=0).generate()
+        self.assertEqual(profiler.stages, {})
+
+class TestLazyImports(unittest.TestCase):
+    def test_exoplanet_curve_imports_neither_matplotlib_nor_astropy(self):
+        code = ("import sys, lcEnhance.LCE as lce; "
+                "lce.LightCurveExoplanet(lce.Exoplanet(1, 0.05), lce.Star(1), numper=3).generate(); "
+                "sys.exit(any(m in sys.modules for m in ('matplotlib', 'astropy')))")
+        self.assertEqual(subprocess.run([sys.executable, "-c", code]).returncode, 0)
+
+    def test_meters_match_astropy(self):
+        for name, meters in lce._METERS.items():
+            self.assertEqual(meters, (1 * getattr(u, name)).to_value(u.m))
+
+class TestCli(unittest.TestCase):
+    def test_batch_regenerates_from_metadata(self):
+        spec = {"seed": 3, "dtype": "float32",
+                "curves": [{"kind": "theoretical", "count": 5, "ticksinper": 50, "numper": 3, "duration": .1},
+                           {"kind": "exoplanet", "count": 2, "planet": {"rad": 1, "a": .05}, "star": {"rad": 1},
+                            "ticksinper": 80, "numper": 2}]}
+        with tempfile.TemporaryDirectory() as tmp:
+            specfile = os.path.join(tmp, "spec.json")
+            with open(specfile, "w") as f:
+                json.dump(spec, f)
+            self.assertEqual(cli.main(["generate", specfile, "-o", tmp, "-p", "2", "-q"]), 0)
+            meta, flux = cli.read_batch(tmp)
+            self.assertEqual(len(meta), 7)
+            self.assertEqual(flux.dtype, np.float32)
+            self.assertEqual(len(flux), 5 * 150 + 2 * 160)
+            for i in (0, 4, 6):
+                entry = cli.expand_spec(spec)[i]
+                lc = cli.make_curve(entry, int(meta["seed"][i]), np.float32)
+                self.assertEqual(lc.location, meta["location"][i])
+                self.assertEqual(lc.depth, meta["depth"][i])
+                o, n = meta["offset"][i], meta["length"][i]
+                np.testing.assert_array_equal(flux[o:o + n], lc.generate()[1])
+            del flux
+
+class TestExport(unittest.TestCase):
+    def test_population_round_trip(self):
+        population = TransitPopulation(np.linspace(.01, .1, 10), .1, ticksinper=50, numper=2, seed=1)
+        population.generate()
+        table = export.population_table(population)
+        self.assertTrue(np.shares_memory(export.flux_matrix(table), population.flux))
+        rows = [7, 0, 3]
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("curves.parquet", "curves.arrow"):
+                filename = os.path.join(tmp, name)
+                export.write(table, filename, row_group_size=4)
+                subset = export.read(filename, rows=rows, columns=["flux", "location"])
+                self.assertEqual(subset.column_names, ["flux", "location"])
+                np.testing.assert_array_equal(export.flux_matrix(subset), population.flux[rows])
+                np.testing.assert_array_equal(subset.column("location").to_numpy(), population.locations[rows])
+                del subset
+            filename = os.path.join(tmp, "curves.arrow")
+            subset = export.read(filename, rows=[2, 3, 4, 8])
+            np.testing.assert_array_equal(export.flux_matrix(subset), population.flux[[2, 3, 4, 8]])
+            import pyarrow as pa
+            allocated = pa.total_allocated_bytes()
+            mapped = export.read(filename, rows=[5, 6, 7])
+            view = export.flux_matrix(mapped)
+            self.assertEqual(pa.total_allocated_bytes(), allocated)
+            np.testing.assert_array_equal(view, population.flux[5:8])
+            del subset, mapped, view
+
+    def test_empty_and_negative_rows(self):
+        population = TransitPopulation(np.linspace(.01, .1, 10), .1, ticksinper=50, numper=2, seed=1)
+        population.generate()
+        table = export.population_table(population)
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("curves.parquet", "curves.arrow"):
+                filename = os.path.join(tmp, name)
+                export.write(table, filename, row_group_size=4)
+                empty = export.read(filename, rows=[], columns=["flux", "depth"])
+                self.assertEqual((empty.num_rows, empty.column_names), (0, ["flux", "depth"]))
+                subset = export.read(filename, rows=[-1, 0, -10])
+                np.testing.assert_array_equal(export.flux_matrix(subset), population.flux[[9, 0, 0]])
+                with self.assertRaises(Exception):
+                    export.read(filename, rows=[10])
+                del empty, subset
+
+    def test_ragged_batch(self):
+        spec = {"seed": 0, "curves": [{"count": 2, "ticksinper": 30, "numper": 2}, {"ticksinper": 40}]}
+        with tempfile.TemporaryDirectory() as tmp:
+            cli.generate(spec, tmp, processes=1, progress=None)
+            table = export.batch_table(tmp)
+            meta, flux = cli.read_batch(tmp)
+            self.assertEqual(table.num_rows, 3)
+            np.testing.assert_array_equal(table.column("flux")[2].values.to_numpy(), flux[120:])
+            np.testing.assert_array_equal(table.column("seed").to_numpy(), meta["seed"])
+            del table, flux
+
+class TestTransitIntervals(unittest.TestCase):
+    def test_intervals_cover_injected_samples(self):
+        for seed in range(5):
+            lc = lce.LightCurveTheoretical(ticksinper=200, duration=.2, numper=4, noise=0, seed=seed)
+            _, flux = lc.generate()
+            idx = lc.transit_indices()
+            self.assertTrue(np.all(np.diff(idx) > 0))
+            self.assertEqual(len(idx), 4 * (lc.ub - lc.lb + 2 * lc.slopelength))
+            self.assertTrue(set(np.flatnonzero(flux != 1)) <= set(idx))
+            mask = lc.in_transit(np.arange(lc.length))
+            np.testing.assert_array_equal(np.flatnonzero(mask), idx)
+
+    def test_wrapped_transit_is_split(self):
+        intervals = lce._transit_intervals([90, 190], [110, 210], 200)
+        np.testing.assert_array_equal(intervals, [[0, 10], [90, 110], [190, 200]])
+        np.testing.assert_array_equal(lce._transit_intervals([0, 5], [10, 20], 50), [[0, 20]])
+
+    def test_no_intervals(self):
+        import matplotlib.pyplot as plt
+        lc = lce.LightCurveTheoretical(ticksinper=10, numper=3, seed=0)
+        lc.generate()
+        self.assertEqual(lc.transits.shape, (0, 2))
+        self.assertFalse(lc.in_transit(np.arange(lc.length)).any())
+        self.assertFalse(lc.in_transit(4))
+        self.assertEqual(len(lc.transit_indices()), 0)
+        (x, low, _), (tx, _, _) = lc.envelope(5)
+        self.assertEqual((len(x), len(tx), low.min()), (5, 0, lc.flux.min()))
+        lc.plot(decimate=True)
+        plt.close("all")
+
+    def test_cache_hit_restores_intervals(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LightCurveCache(tmp)
+            lc = lce.LightCurveTheoretical(numper=3, seed=2)
+            cache.generate(lc)
+            lc2 = lce.LightCurveTheoretical(numper=3, seed=2)
+            cache.generate(lc2)
+            self.assertEqual(cache.hits, 1)
+            np.testing.assert_array_equal(lc2.transits, lc.transits)
+
+class TestDecimatedPlot(unittest.TestCase):
+    def tearDown(self):
+        import matplotlib.pyplot as plt
+        plt.close("all")
+
+    def test_points_bounded_and_dips_exact(self):
+        import matplotlib.pyplot as plt
+        lc = lce.LightCurveTheoretical(ticksinper=10000, duration=.05, numper=100, seed=1)
+        lc.generate()
+        for phase_flag in (False, True):
+            lc.plot(phase_flag=phase_flag, decimate=200)
+            light, transit = plt.gca().collections[1::2]
+            self.assertLessEqual(len(light.get_offsets()), 400)
+            self.assertEqual(light.get_offsets()[:, 1].min(), lc.flux.min())
+            self.assertEqual(transit.get_offsets()[:, 1].min(), lc.flux[lc.transit_indices()].min())
+            self.assertEqual(light.get_offsets()[:, 1].max(), lc.flux.max())
+            self.assertTrue(np.isfinite(transit.get_offsets()).all())
+
+    def test_every_sample_when_columns_exceed_samples(self):
+        lc = lce.LightCurveTheoretical(ticksinper=50, duration=.2, numper=2, seed=3)
+        lc.generate()
+        (x, low, high), (tx, tlow, thigh) = lc.envelope(1000)
+        np.testing.assert_array_equal(x, lc.timesteps)
+        np.testing.assert_array_equal(low, lc.flux)
+        np.testing.assert_allclose(tx * lc.ticksinper, lc.transit_indices())
+        (x, low, high), _ = lc.envelope(1000, xlim=[.5, 1])
+        np.testing.assert_array_equal(low, lc.flux[25:51])
+
+    def test_no_columns(self):
+        lc = lce.LightCurveTheoretical(ticksinper=50, numper=2, seed=3)
+        lc.generate()
+        for decimate in (0, -5):
+            with self.assertRaises(Exception) as context:
+                lc.plot(decimate=decimate)
+            self.assertIn("ValueError", str(context.exception))
+        with self.assertRaises(Exception):
+            lc.envelope(0)
+
+class TestPyramid(unittest.TestCase):
+    def test_zoomed_envelope_matches_flux(self):
+        lc = lce.LightCurveTheoretical(ticksinper=5000, duration=.1, numper=200, seed=5)
+        lc.generate()
+        for xlim in ([0, 200], [3.3, 17.91], [101.2, 101.25], [57.4, 57.4002]):
+            first = int(np.ceil(xlim[0] * lc.ticksinper - 1e-9))
+            stop = min(int(np.floor(xlim[1] * lc.ticksinper + 1e-9)) + 1, lc.length)
+            (x, low, high), (tx, tlow, thigh) = lc.envelope(300, xlim=xlim)
+            self.assertLessEqual(len(x), 300)
+            self.assertTrue(np.all(np.diff(x) > 0))
+            self.assertEqual(low.min(), lc.flux[first:stop].min())
+            self.assertEqual(high.max(), lc.flux[first:stop].max())
+            transit = lc.flux[first:stop][lc.in_transit(np.arange(first, stop))]
+            if len(transit):
+                self.assertEqual(tlow.min(), transit.min())
+            else:
+                self.assertEqual(len(tx), 0)
+
+    def test_pyramid_rebuilt_after_generate(self):
+        lc = lce.LightCurveTheoretical(ticksinper=1000, numper=10, seed=6)
+        lc.generate()
+        lc.envelope(100)
+        pyramid = lc._pyramid
+        lc.envelope(100, xlim=[2, 3])
+        self.assertIs(lc._pyramid, pyramid)
+        lc.generate()
+        (_, low, _), _ = lc.envelope(100)
+        self.assertIsNot(lc._pyramid, pyramid)
+        self.assertEqual(low.min(), lc.flux.min())
+
+    def test_pyramid_rebuilt_after_generate_into_same_buffer(self):
+        lc = lce.LightCurveTheoretical(ticksinper=1000, numper=10, seed=6)
+        lc.generate()
+        lc.envelope(10)
+        lc.depth = .5
+        lc.generate(out=lc.flux)
+        (_, low, _), (_, transit_low, _) = lc.envelope(10)
+        self.assertEqual(low.min(), lc.flux.min())
+        self.assertEqual(transit_low.min(), lc.flux.min())
+
+    def test_zoom_on_memmapped_curve_builds_no_timesteps(self):
+        expected = lce.LightCurveTheoretical(ticksinper=1000, duration=.1, numper=200, seed=5)
+        expected.generate()
+        with tempfile.TemporaryDirectory() as tmp:
+            lc = lce.LightCurveTheoretical(ticksinper=1000, duration=.1, numper=200, seed=5)
+            lc.generate(filename=os.path.join(tmp, "curve.npy"))
+            lc.envelope(100)
+            for xlim in ([3.3, 17.91], [101.2, 101.25], [57.4, 57.4002]):
+                tracemalloc.start()
+                zoomed = lc.envelope(100, xlim=xlim)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.assertLess(peak, lc.length)
+                for got, want in zip(zoomed, expected.envelope(100, xlim=xlim)):
+                    for a, b in zip(got, want):
+                        np.testing.assert_array_equal(a, b)
+            del lc
+
+    def test_timestep_index_matches_searchsorted(self):
+        for ticksinper in (7, 97, 1000, 12.5):
+            timesteps = np.arange(3000) / ticksinper
+            values = np.concatenate((timesteps[::13], np.nextafter(timesteps[::13], np.inf),
+                                     np.nextafter(timesteps[::13], -np.inf), [-1, 1e9]))
+            for side in ("left", "right"):
+                found = [lce._timestep_index(3000, ticksinper, v, side=side) for v in values]
+                np.testing.assert_array_equal(found, np.searchsorted(timesteps, values, side=side))
+
+class TestPhaseFold(unittest.TestCase):
+    def test_matches_per_bin_statistics(self):
+        lc = lce.LightCurveTheoretical(ticksinper=300, duration=.1, numper=20, seed=8)
+        timesteps, flux = lc.generate()
+        profile = phase_fold(timesteps, flux, bins=37, median=True)
+        idx = np.minimum((timesteps % 1 * 37).astype(int), 36)
+        for b in range(37):
+            samples = flux[idx == b]
+            self.assertEqual(profile.count[b], len(samples))
+            self.assertAlmostEqual(profile.mean[b], samples.mean(), places=12)
+            self.assertAlmostEqual(profile.std[b], samples.std(), places=12)
+            self.assertEqual(profile.median[b], np.median(samples))
+        self.assertEqual(profile.count.sum(), lc.length)
+
+    def test_empty_bins_and_plot(self):
+        import matplotlib.pyplot as plt
+        profile = phase_fold([0, .1, .15], [1., 2., 4.], bins=4, median=True)
+        np.testing.assert_array_equal(profile.count, [3, 0, 0, 0])
+        self.assertEqual(profile.median[0], 2)
+        self.assertTrue(np.isnan(profile.mean[1:]).all() and np.isnan(profile.median[1:]).all())
+        profile.plot(name="test")
+        plt.close("all")
+
+class TestPhaseFoldAccumulator(unittest.TestCase):
+    def test_stream_matches_full_fold(self):
+        def make():
+            return lce.LightCurveTheoretical(ticksinper=250, duration=.1, numper=40, seed=9)
+        profile = phase_fold(*make().generate(), bins=50)
+        streamed = stream_fold(make(), bins=50, chunksize=777)
+        np.testing.assert_array_equal(streamed.count, profile.count)
+        np.testing.assert_allclose(streamed.mean, profile.mean, rtol=0, atol=1e-13)
+        np.testing.assert_allclose(streamed.std, profile.std, rtol=1e-9, atol=1e-15)
+
+    def test_merge_and_empty_bins(self):
+        timesteps = np.linspace(0, .49, 500)
+        flux = 1 + np.sin(timesteps * 40)
+        a, b = PhaseFoldAccumulator(bins=10), PhaseFoldAccumulator(bins=10)
+        a.update(timesteps[:123], flux[:123])
+        b.update(timesteps[123:], flux[123:])
+        a.merge(b)
+        profile = phase_fold(timesteps, flux, bins=10)
+        np.testing.assert_array_equal(a.count, profile.count)
+        np.testing.assert_allclose(a.profile().std, profile.std, rtol=1e-12)
+        self.assertTrue(np.isnan(a.profile().mean[5:]).all())
+
+class TestBLS(unittest.TestCase):
+    def test_recovers_generated_transit(self):
+        for seed in range(3):
+            lc = lce.LightCurveTheoretical(ticksinper=400, numper=25, noise=.002, seed=seed)
+            depth = lc.depth
+            timesteps, flux = lc.generate()
+            result = bls_search(timesteps, flux, np.linspace(.5, 2, 301), threads=2)
+            self.assertAlmostEqual(result.period, 1, delta=.005)
+            phase = (.5 + lc.location/lc.ticksinper) % 1
+            self.assertLess(abs((result.phase - phase + .5) % 1 - .5), 2/200)
+            self.assertAlmostEqual(result.duration, lc.duration/lc.ticksinper, delta=.02)
+            self.assertAlmostEqual(result.depth, depth, delta=.2 * depth)
+
+    def test_no_periods(self):
+        with self.assertRaises(Exception):
+            bls_search(np.arange(10)/5, np.ones(10), [])
+
+    def test_independent_of_threads(self):
+        lc = lce.LightCurveTheoretical(ticksinper=200, numper=10, seed=4)
+        timesteps, flux = lc.generate()
+        a = bls_search(timesteps, flux, np.linspace(.8, 1.2, 41), threads=1)
+        b = bls_search(timesteps, flux, np.linspace(.8, 1.2, 41), threads=3)
+        np.testing.assert_array_equal(a.power, b.power)
+        self.assertEqual((a.period, a.phase, a.depth), (b.period, b.phase, b.depth))
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,6 +9,7 @@
 import os
 import sys
 sys.path.insert(0, os.path.abspath('../lcEnhance/'))
+sys.path.insert(0, os.path.abspath('..'))
 
 project = 'lcEnhance'
 copyright = '2025, Sam Kleiman, Shafayet Rahman'
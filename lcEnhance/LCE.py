@@ -1,127 +1,925 @@
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+
 import numpy as np
-import matplotlib.pyplot as plt
-import astropy.units as u
 
-class LightCurveTheoretical(object):
+def _transit_bounds(ticksinper, duration, numper):
     """
-        Light Curve with transit details for one period, for theoretical transit details
+    Finds the bounds of the flat part of the transit in every period, before the location shift
+
+    Args:
+        ticksinper (integer): Number of timesteps in a single period
+        duration (float or array): Time length of the transit in timesteps, one per system for populations
+        numper (integer): Number of periods to be simulated
+
+    Returns:
+        array: Lower bound of the transit in each period, with shape (numper,) or (n_systems, numper)
+        array: Upper bound of the transit in each period, with shape (numper,) or (n_systems, numper)
+
+    """
+
+    #same arithmetic as the old per-period loop so the bounds truncate identically
+
+    centers = ticksinper/2 * (1 + 2 * np.arange(numper))
+    duration = np.asarray(duration)[..., None]
+    lb = (centers - duration/2).astype(int)
+    ub = (centers + duration/2).astype(int)
+    return lb, ub
+
+def _depth_sequence(depth, numper, rng):
+    """
+    Draws the random walk of the transit depth from one period to the next
+
+    Args:
+        depth (float or array): Depth of the transit in the first period, one per system for populations
+        numper (integer): Number of periods to be simulated
+        rng (Generator): Source of the random jitter
+
+    Returns:
+        array: numper + 1 depths along the last axis, the last one being the depth after the final period
+
+    """
+
+    depth = np.asarray(depth, dtype = float)
+    jitter = rng.normal(loc = 0, scale = 0.0001, size = depth.shape + (numper,))
+    return np.cumsum(np.concatenate((depth[..., None], jitter), axis = -1), axis = -1)
+
+#accepted rad_unit and a_unit names and the astropy units they stand for
+
+_RAD_UNITS = {"R_J": "R_jup", "R_earth": "R_earth", "m": "m"}
+_A_UNITS = {"AU": "au", "m": "m"}
+
+#meters in each astropy unit used here (IAU 2015 nominal values, as in astropy), so SI values never need astropy
+
+_METERS = {"R_jup": 7.1492e7, "R_earth": 6.3781e6, "R_sun": 6.957e8, "au": 1.495978707e11, "m": 1.0}
+
+def _units():
+    """
+    Imports astropy.units on first use, so that importing lcEnhance and simulating light curves never loads astropy
+
+    Returns:
+        module: astropy.units
+
+    """
+
+    import astropy.units as u
+    return u
+
+def _length_unit(name, units, argname):
+    """
+    Looks up the astropy unit name for a rad_unit or a_unit name
+
+    Args:
+        name (string): Name of the unit as passed by the user
+        units (dict): Accepted names, _RAD_UNITS or _A_UNITS
+        argname (string): Name of the argument, for the error message
+
+    Returns:
+        string: Name of the unit in astropy.units
+
+    """
+
+    if name not in units:
+        names = [f"'{n}'" for n in units]
+        if len(names) == 2:
+            raise Exception(f"ValueError: {argname} must be either {names[0]} or {names[1]}.")
+        raise Exception(f"ValueError: {argname} must be {', '.join(names[:-1])}, or {names[-1]}.")
+    return units[name]
+
+class _LazyQuantity(object):
+    """
+        Attribute giving an astropy Quantity built from a stored value and unit name on access, so astropy is only
+        imported when units are actually used. Assigning a Quantity converts it to the stored unit, assigning a plain
+        number takes it in the stored unit
+
+        Args:
+            value (string): Name of the attribute holding the value
+            unit (string): Name of the attribute holding the astropy unit name
+
+    """
+
+    def __init__(self, value, unit):
+        self.value = value
+        self.unit = unit
+
+    def __get__(self, obj, objtype = None):
+        if obj is None:
+            return self
+        return getattr(obj, self.value) * getattr(_units(), getattr(obj, self.unit))
+
+    def __set__(self, obj, quantity):
+        if hasattr(quantity, "to_value"):
+            quantity = quantity.to_value(getattr(_units(), getattr(obj, self.unit)))
+        setattr(obj, self.value, quantity)
+
+class _InMeters(object):
+    """
+        Attribute giving a stored value in meters as a plain float or array, read from the same stored value as its
+        _LazyQuantity so the two never disagree
 
         Args:
+            value (string): Name of the attribute holding the value
+            unit (string): Name of the attribute holding the astropy unit name
+
+    """
+
+    def __init__(self, value, unit):
+        self.value = value
+        self.unit = unit
+
+    def __get__(self, obj, objtype = None):
+        if obj is None:
+            return self
+        return getattr(obj, self.value) * _METERS[getattr(obj, self.unit)]
+
+    def __set__(self, obj, meters):
+        setattr(obj, self.value, meters / _METERS[getattr(obj, self.unit)])
+
+def _seeded_rng(seed):
+    """
+    Makes the random generator of one light curve
+
+    Args:
+        seed (integer, SeedSequence or Generator): Seed of the light curve, a fresh one is drawn from the OS if None
+
+    Returns:
+        Generator: Generator to draw every random number of the light curve from
+        integer or SeedSequence: Seed to store so the light curve can be regenerated exactly, None if a Generator was
+        given
+
+    """
+
+    if isinstance(seed, np.random.Generator):
+        return seed, None
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    return np.random.default_rng(seed), seed
+
+def _ragged_arange(starts, counts):
+    """
+    Concatenates arange(start, start + count) for every start and count without a Python loop
+
+    Args:
+        starts (array): First value of each range
+        counts (array): Number of values in each range
+
+    Returns:
+        array: Concatenated ranges
+        array: Position of each value within its own range
+
+    """
+
+    offsets = np.cumsum(counts) - counts
+    steps = np.arange(counts.sum()) - np.repeat(offsets, counts)
+    return np.repeat(starts, counts) + steps, steps
+
+def _transit_intervals(first, last, length):
+    """
+    Turns the raw start and stop of every transit after the location shift into sorted, disjoint intervals of the
+    light curve. Transits wrapped around the end of the light curve are split in two, overlapping ones are merged
+
+    Args:
+        first (array): Index of the first sample of each transit after the shift, possibly past the end
+        last (array): Index one past the last sample of each transit after the shift
+        length (integer): Number of total timesteps of the light curve
+
+    Returns:
+        array: Start and stop (exclusive) of every in-transit interval, with shape (n_intervals, 2)
+
+    """
+
+    first = np.asarray(first, dtype = np.int64)
+    if length <= 0:
+        return np.empty((0, 2), dtype = np.int64)
+    starts = first % length
+    stops = starts + np.minimum(np.asarray(last, dtype = np.int64) - first, length)
+    wrapped = stops > length
+    starts = np.concatenate((starts, np.zeros(np.count_nonzero(wrapped), dtype = np.int64)))
+    stops = np.concatenate((np.minimum(stops, length), stops[wrapped] - length))
+    keep = stops > starts
+    order = np.argsort(starts[keep], kind = 'stable')
+    starts, stops = starts[keep][order], stops[keep][order]
+
+    #merges intervals that overlap or touch, so a point lies in at most one interval
+
+    if len(starts):
+        reach = np.maximum.accumulate(stops)
+        new = np.flatnonzero(np.concatenate(([True], starts[1:] > reach[:-1])))
+        starts, stops = starts[new], np.maximum.reduceat(stops, new)
+    return np.stack((starts, stops), axis = 1)
+
+def _inject_transits(flux, lb, ub, slopelength, depths, shift = 0, start = 0, length = None):
+    """
+    Subtracts the box of every transit and writes the ingress and egress slopes, in place
+
+    Args:
+        flux (array): Flux with the baseline already in it, either one curve or one row per system. Modified in place
+        lb (array): Lower bound of the transit in each period, with one row per system for a 2D flux
+        ub (array): Upper bound of the transit in each period, with one row per system for a 2D flux
+        slopelength (integer or array): Duration of the sloped part of the transit, broadcast against lb
+        depths (array): Depth of the transit in each period, broadcast against lb
+        shift (integer or array, default = 0): Location shift of the transits, wrapping around the end of the flux
+            like np.roll. Broadcast against lb
+        start (integer, default = 0): Index of the first sample of flux in the whole light curve, when flux is only
+            one window of it. Samples of the transits outside the window are skipped
+        length (integer, default = None): Number of total timesteps of the whole light curve, defaults to the length
+            of flux
+
+    """
+
+    width = flux.shape[-1]
+    if length is None:
+        length = width
+    rows = None
+    if flux.ndim == 2:
+        rows = np.repeat(np.arange(flux.shape[0]), np.shape(lb)[-1])
+    lb, ub, slopelength, depths, shift = [np.broadcast_to(a, np.shape(lb)).ravel()
+                                          for a in (lb, ub, slopelength, depths, shift)]
+
+    def section(starts, counts, wrapped = None):
+        #indices of one part of every transit, shifted and wrapped into the flux. wrapped = True keeps only the
+        #samples from before the start of the light curve, False only the others
+
+        idx, steps = _ragged_arange(starts, counts)
+        keep = True if wrapped is None else (idx < 0) == wrapped
+        idx = (idx + np.repeat(shift, counts)) % length - start
+        keep &= (idx >= 0) & (idx < width)
+        steps = steps[keep]
+        slope = np.repeat(slopelength, counts)[keep]
+        depth = np.repeat(depths, counts)[keep].astype(flux.dtype, copy = False)
+        idx = idx[keep]
+        if rows is not None:
+            idx = (np.repeat(rows, counts)[keep], idx)
+        return idx, steps, slope, depth
+
+    #boxes: one flat index array covering every period, since the widths can differ by a tick
+
+    idx, _, _, depth = section(lb, ub - lb)
+    flux[idx] -= depth
+
+    #slopes overwrite the flux in the order of a loop over the periods, so the later period wins where they overlap:
+    #the ingress of the first period wrapped to the end, then the egresses, then the other ingresses
+
+    idx, steps, slope, depth = section(lb - slopelength, slopelength, True)
+    flux[idx] = 1 - (steps/slope).astype(flux.dtype, copy = False) * depth
+    idx, steps, slope, depth = section(ub, slopelength)
+    flux[idx] = 1 + ((steps - slope)/slope).astype(flux.dtype, copy = False) * depth
+    idx, steps, slope, depth = section(lb - slopelength, slopelength, False)
+    flux[idx] = 1 - (steps/slope).astype(flux.dtype, copy = False) * depth
+
+@functools.lru_cache(maxsize = 128)
+def _transit_template(ticksinper, duration, slopelength):
+    """
+    Builds the unit-depth transit of one period, cached so that curves sharing a shape share the template
+
+    Args:
+        ticksinper (integer): Number of timesteps in a single period
+        duration (float): Time length of the transit in timesteps
+        slopelength (integer): Duration of the sloped part of the transit
+
+    Returns:
+        tuple: Offsets of the box, the ingress and the egress from the start of the period, and the fraction of the
+        depth the ingress and egress slopes are written at (read-only arrays)
+
+    """
+
+    lb, ub = _transit_bounds(ticksinper, duration, 1)
+    steps = np.arange(slopelength)
+    template = (np.arange(lb[0], ub[0]), lb[0] - slopelength + steps, ub[0] + steps,
+                steps/slopelength, (steps - slopelength)/slopelength)
+    for a in template:
+        a.flags.writeable = False
+    return template
+
+def _inject_template(flux, template, offsets, depths, shift = 0, start = 0, length = None):
+    """
+    Writes a cached transit template at the start of every period, in place. Gives the same flux as
+    _inject_transits for transits with the same shape in every period
+
+    Args:
+        flux (array): Flux with the baseline already in it, modified in place
+        template (tuple): Template from _transit_template
+        offsets (array): Index of the start of each period before the location shift
+        depths (array): Depth of the transit in each period
+        shift (integer, default = 0): Location shift of the transits, wrapping around the end of the flux
+        start (integer, default = 0): Index of the first sample of flux in the whole light curve
+        length (integer, default = None): Number of total timesteps of the whole light curve, defaults to the length
+            of flux
+
+    """
+
+    width = len(flux)
+    if length is None:
+        length = width
+    box, ingress, egress, ramp_in, ramp_out = template
+    depths = depths.astype(flux.dtype, copy = False)[:, None]
+
+    def place(part, wrapped = None):
+        #indices of one part of the template in every period, shifted and wrapped into the flux. wrapped selects the
+        #samples from before the start of the light curve like in _inject_transits
+
+        idx = offsets[:, None] + part
+        keep = True if wrapped is None else (idx < 0) == wrapped
+        idx = (idx + shift) % length - start
+        keep = keep & (idx >= 0) & (idx < width)
+        return idx[keep], keep
+
+    idx, keep = place(box)
+    flux[idx] -= np.broadcast_to(depths, keep.shape)[keep]
+
+    #same order as _inject_transits, so the later period wins where slopes overlap
+
+    idx, keep = place(ingress, True)
+    flux[idx] = (1 - ramp_in.astype(flux.dtype) * depths)[keep]
+    idx, keep = place(egress)
+    flux[idx] = (1 + ramp_out.astype(flux.dtype) * depths)[keep]
+    idx, keep = place(ingress, False)
+    flux[idx] = (1 - ramp_in.astype(flux.dtype) * depths)[keep]
+
+#samples in each block of the finest level of the min/max pyramid of a light curve
+
+_PYRAMID_BLOCK = 16
+
+def _minmax_pyramid(low, high, factor = 4):
+    """
+    Builds a min/max pyramid, each level reducing blocks of factor samples of the one below
+
+    Args:
+        low (array): Samples reduced by min, usually the flux
+        high (array): Samples reduced by max, usually the flux
+        factor (integer, default = 4): Number of samples or blocks reduced into each block of the next level
+
+    Returns:
+        list of tuple: Min and max of every block, level k (from 0) having blocks of factor**(k + 1) samples
+
+    """
+
+    levels = []
+    while len(low) > 1:
+        starts = np.arange(0, len(low), factor)
+        low, high = np.minimum.reduceat(low, starts), np.maximum.reduceat(high, starts)
+        levels.append((low, high))
+    return levels
+
+def _baseline(rng, noise, size):
+    """
+    Draws the next samples of the noise baseline, always in float64 so every dtype sees the same noise
+
+    Args:
+        rng (Generator): Generator of the noise, consumed in order
+        noise (float): Normalized noise to be added to the flux
+        size (integer): Number of samples to draw
+
+    Returns:
+        array: Baseline flux, offset by one like fluxOG
+
+    """
+
+    return np.ones(size) + rng.normal(loc = 0, scale = noise, size = size) + 1
+
+#profilers currently recording, checked before every stage so the disabled path is a single falsy test
+
+_profilers = []
+
+class Profiler(object):
+    """
+        Records the wall time and memory of every stage of light curve generation and plotting while it is
+        active. Stages are "__init__", "generate", "noise", "inject", "plot", "transits", "decimate" and "scatter";
+        "noise" and "inject" are recorded once per window. Stages from every thread are recorded.
+
+        Args:
+            callback (callable, default = None): Called as callback(stage, record) every time a stage finishes, to feed
+                a metrics system
+            memory (Bool, default = False): Also record the memory of each stage with tracemalloc, which slows
+                everything down
+
+        Attributes:
+            stages (dict): For each stage, the number of calls, the total seconds, the largest peak and the total net
+                bytes. The peak of a call is the most memory held during it above what was in use when it began, so it
+                counts the temporaries the stage frees before returning; the net bytes are only what it still holds at
+                the end. tracemalloc traces the whole process, so stages running at the same time in other threads
+                add to both
+
+        Example:
+            with Profiler() as profiler:
+                LightCurveTheoretical(numper = 100).plot_transit()
+            print(profiler.stages["inject"]["seconds"])
+
+    """
+
+    def __init__(self, callback = None, memory = False):
+        self.callback = callback
+        self.memory = memory
+        self.stages = {}
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _profilers.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def record(self, stage, record):
+        """
+        Adds one finished stage to the totals and passes it to the callback
+
+        Args:
+            stage (string): Name of the stage
+            record (dict): Seconds, peak bytes and net bytes of the stage, both zero without tracemalloc
+
+        """
+
+        totals = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "peak": 0, "bytes": 0})
+        totals["calls"] += 1
+        totals["seconds"] += record["seconds"]
+        totals["peak"] = max(totals["peak"], record["peak"])
+        totals["bytes"] += record["bytes"]
+        if self.callback is not None:
+            self.callback(stage, record)
+
+#stages currently running, which keep their peak memory so far when a nested stage resets the tracemalloc peak
+
+_open_stages = []
+
+class _Stage(object):
+    #times one stage for every active profiler, and finds its peak memory while tracemalloc is tracing
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.bytes = None
+        self.peak = 0
+        if tracemalloc.is_tracing():
+            self.bytes, peak = tracemalloc.get_traced_memory()
+            for stage in _open_stages:
+                if stage.bytes is not None:
+                    stage.peak = max(stage.peak, peak - stage.bytes)
+            tracemalloc.reset_peak()
+        _open_stages.append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record = {"seconds": time.perf_counter() - self.start, "peak": 0, "bytes": 0}
+        _open_stages.remove(self)
+        if self.bytes is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record["peak"] = max(self.peak, peak - self.bytes)
+            record["bytes"] = current - self.bytes
+        for profiler in list(_profilers):
+            profiler.record(self.name, record)
+
+_NO_STAGE = contextlib.nullcontext()
+
+def _stage(name):
+    """
+    Context manager around one stage, doing nothing unless a Profiler is active
+
+    Args:
+        name (string): Name of the stage
+
+    """
+
+    if not _profilers:
+        return _NO_STAGE
+    return _Stage(name)
+
+def _staged(name):
+    """
+    Decorator recording a whole method as one stage
+
+    Args:
+        name (string): Name of the stage
+
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profilers:
+                return func(*args, **kwargs)
+            with _Stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class _Timesteps(object):
+    """
+        Timesteps of a light curve written to a file, computed for the requested samples only instead of being stored,
+        since they are just np.arange(length)/ticksinper. Indexes like a 1D array and converts to one with np.asarray
+
+        Args:
+            length (integer): Number of total timesteps
             ticksinper (integer): Number of timesteps in a single period
-            depth (float): Depth of transit to be simulated
-            duration (float): Fraction of one period for planet to be in transit
-            noise (float): Noise to be added to the flux
-            numper (integer): Number of periods to be simulated
-            name (string): Name of the object, sent to self.plot
-        
 
         Attributes:
-            ticksinper (integer): Number of timesteps in one period
             length (integer): Number of total timesteps
-            depth (float): Depth of simulated transit
-            duration (float): Time length of simulated transit
-            noise (float): Normalized noise to be added to flux
-            location (float): Central location of transit
-            fluxOG (array): Flux of the lightcurve to be stored in order to remake light curves
-            per (integer): current number of period being simulated
-            numper (integer): The total number of periods to be simulated
-            slopelength (integer): Duration of which to have sloped part of transit
-            name (string): Name of object to be passed to self.plot
-            flux (array): Flux to be plotted on the light curve. Is reset each time plot_transit is called to preserve depth
-            lb (integer): Found lower bound for transit 
-            ub (integer): Found upper bound for transit
-            
+            ticksinper (integer): Number of timesteps in a single period
+
     """
 
-    def __init__(self, ticksinper = 100, depth = 0, duration = 0, noise = .001, numper = 1, name = ""):
-        
-        #sets intiial parameters, randomizes uninputted ones
+    dtype = np.dtype(float)
+    ndim = 1
 
+    def __init__(self, length, ticksinper):
+        self.length = length
         self.ticksinper = ticksinper
-        self.length = self.ticksinper * numper
-        if depth == 0:
-            self.depth = np.random.uniform(.01,.20)
-        else:
-            self.depth = depth
-        if duration == 0:
-            self.duration = np.random.randint(.02 * ticksinper, .15 * ticksinper)
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return np.arange(*key.indices(self.length))/self.ticksinper
+        key = np.asarray(key)
+        if key.dtype == bool:
+            key = np.flatnonzero(key)
+        if np.any((key < -self.length) | (key >= self.length)):
+            raise IndexError("index out of range for timesteps of length " + f"{self.length}")
+        return (key % self.length)/self.ticksinper
+
+    def __array__(self, dtype = None, copy = None):
+        return np.asarray(np.arange(self.length)/self.ticksinper, dtype = dtype)
+
+def _timestep_index(length, ticksinper, value, side = 'left'):
+    """
+    Finds where a value goes among the timesteps np.arange(length)/ticksinper like np.searchsorted, from value *
+    ticksinper then a check of its neighbours, without building the timesteps
+
+    Args:
+        length (integer): Number of total timesteps
+        ticksinper (integer): Number of timesteps in a single period
+        value (float): Timestep to look up
+        side (string, default = 'left'): Side of equal timesteps to return, as in np.searchsorted
+
+    Returns:
+        integer: Number of timesteps below value, or not above it for side = 'right'
+
+    """
+
+    if side == 'left':
+        below = lambda i: i/ticksinper < value
+    else:
+        below = lambda i: i/ticksinper <= value
+    index = int(min(max(np.ceil(value * ticksinper), 0), length))
+    while index > 0 and not below(index - 1):
+        index -= 1
+    while index < length and below(index):
+        index += 1
+    return index
+
+def _metadata_path(filename):
+    #sidecar file holding what is needed to rebuild the timesteps of a light curve file
+
+    return os.path.splitext(filename)[0] + ".json"
+
+def load_lightcurve(filename, mode = 'r'):
+    """
+    Reopens a light curve written by generate(filename = ...) without reading it into memory. Slicing the returned
+    flux only pages in the requested window, and the timesteps are computed for the requested samples only.
+
+    Args:
+        filename (string): Path of the .npy file
+        mode (string, default = 'r'): Memory-map mode passed to np.load, 'r+' to modify the file in place
+
+    Returns:
+        _Timesteps: Timesteps of the lightcurve, computed on indexing
+        memmap: Flux of the lightcurve
+
+    """
+
+    flux = np.load(filename, mmap_mode = mode)
+    with open(_metadata_path(filename)) as f:
+        ticksinper = json.load(f)["ticksinper"]
+    return _Timesteps(len(flux), ticksinper), flux
+
+class _LightCurve(object):
+    """
+        Generation and plotting shared by LightCurveTheoretical and LightCurveExoplanet. Subclasses set the
+        transit parameters (ticksinper, length, depth, duration, noise, location, noise_seed, numper, slopelength,
+        name) in their constructor.
+
+    """
+
+    _timesteps = None
+    _pyramid = None
+
+    @property
+    def fluxOG(self):
+        """
+        Noise baseline of the light curve, only drawn when it is first needed so that constructing light curves is
+        nearly free. The noise is drawn in the order of the shifted light curve, so self.stream can draw it chunk by
+        chunk and still match self.generate.
+
+        """
+
+        if self._fluxOG is None:
+
+            #drawn a chunk at a time and put straight at its unshifted position, so a float32 baseline never needs a
+            #full float64 copy or a np.roll
+
+            rng = np.random.default_rng(self.noise_seed)
+            self._fluxOG = np.empty(self.length, dtype = self.dtype)
+            for start in range(0, self.length, 100000):
+                stop = min(start + 100000, self.length)
+                np.put(self._fluxOG, np.arange(start, stop) - self.location, _baseline(rng, self.noise, stop - start),
+                       mode = 'wrap')
+        return self._fluxOG
+
+    @fluxOG.setter
+    def fluxOG(self, fluxOG):
+        self._fluxOG = fluxOG
+
+    @fluxOG.deleter
+    def fluxOG(self):
+        self._fluxOG = None
+
+    @_staged("generate")
+    def generate(self, filename = None, chunksize = 100000, out = None):
+        """
+        Subtracts transit from the flux without plotting anything, so it is safe to call in headless batch jobs.
+        Transits are written straight at their shifted positions, a window of chunksize timesteps at a time, so the only
+        full-length array made is the flux itself.
+
+        Args:
+            filename (string, default = None): If given, the flux is written into a contiguous memory-mapped .npy
+                file at this path instead of memory, for light curves that do not fit in RAM. The timesteps are not
+                stored, ticksinper goes into a .json file next to it and self.timesteps computes them on indexing.
+                Reopen it with load_lightcurve
+            chunksize (integer, default = 100000): Number of timesteps written at a time
+            out (array, default = None): Buffer of length self.length to write the flux into, so regenerating a curve
+                makes no full-length allocation at all. The timesteps are then not stored either, self.timesteps
+                computes them on indexing like for a file
+
+        Returns:
+            array: Timesteps of the lightcurve, computed on indexing when filename or out is given
+            array: Flux of the lightcurve
+
+        """
+
+        #with a file or a caller buffer the only full-length array is the flux, the timesteps of each window only go
+        #through a scratch buffer, as _fill_window writes them anyway
+
+        lazy = filename is not None or out is not None
+        if filename is not None:
+            out = np.lib.format.open_memmap(filename, mode = 'w+', shape = (self.length,), dtype = self.dtype)
+            with open(_metadata_path(filename), 'w') as f:
+                json.dump({"ticksinper": float(self.ticksinper)}, f)
+        elif out is None:
+            out = np.empty(self.length, dtype = self.dtype)
+        elif np.shape(out) != (self.length,):
+            raise Exception("ValueError: out must have shape (length,).")
+
+        if lazy:
+            self.timesteps = _Timesteps(self.length, self.ticksinper)
+            scratch = np.empty(min(chunksize, self.length))
         else:
-            self.duration = duration * ticksinper
-        self.noise = noise
-        self.location = np.random.randint(0,ticksinper)
-        self.fluxOG = np.ones(self.length) + np.random.normal(loc = 0, scale = self.noise, size = self.length) + 1
-        self.per = 0
-        self.numper = numper
-        self.slopelength = int(self.duration/10)
-        self.name = name
-        
-    def plot_transit(self, phase_flag = False, xlim = []):
-        """ 
-        Subtracts transit from the flux and plots the resulting lightcurve
-        
+            if self._timesteps is None:
+                self._timesteps = np.empty(self.length)
+            self.timesteps = self._timesteps
+
+        plan = self._window_plan()
+        for start in range(0, self.length, chunksize):
+            stop = min(start + chunksize, self.length)
+            timesteps = scratch[:stop - start] if lazy else self.timesteps[start:stop]
+            self._fill_window(timesteps, out[start:stop], start, plan)
+        self.flux = out
+        self._pyramid = None
+
+        if filename is not None:
+            out.flush()
+        return self.timesteps, self.flux
+
+    def stream(self, chunksize = 100000):
+        """
+        Generates the same light curve as self.generate, but yields it in chunks so that long simulations never hold
+        more than one chunk of flux. Transits are written straight into the chunks they fall in, including the ones
+        wrapped from the end of the light curve to its start by the location shift.
+
         Args:
-            phase_flag (Bool, default = False): Decides if graph plotted is phasefolded or not
-            xlim (array): Limits for the x axis sent to the self.plot
+            chunksize (integer, default = 100000): Number of timesteps in each chunk, the last one may be shorter
+
+        Yields:
+            array: Timesteps of the chunk
+            array: Flux of the chunk
+
+        """
+
+        plan = self._window_plan()
+        for start in range(0, self.length, chunksize):
+            stop = min(start + chunksize, self.length)
+            timesteps = np.empty(stop - start)
+            flux = np.empty(stop - start, dtype = self.dtype)
+            self._fill_window(timesteps, flux, start, plan)
+            yield timesteps, flux
+
+    def _window_plan(self):
+        """
+        Finds the transits of every period for self._fill_window and records their intervals in self.transits
+
         Returns:
-            array: Timesteps to plot lightcurve
-            array: Flux for plotted lightcurve
+            tuple: Lower bounds, upper bounds and depths of the transits, the raw start and stop of every transit
+            after the shift, possibly past the end of the light curve, the noise generator if fluxOG is not cached
+            and the transit template if every period has the same shape
 
         """
 
-        self.flux = self.fluxOG - 1
-        self.per = 0
-        while self.per < self.numper:
+        lb, ub, depths = self._transit_plan()
+        first = lb - self.slopelength + self.location
+        last = ub + self.slopelength + self.location
+        self.transits = _transit_intervals(first, last, self.length)
+
+        #without a cached baseline the noise is drawn window by window, in order
+
+        noise = None
+        if self._fluxOG is None:
+            noise = np.random.default_rng(self.noise_seed)
+
+        #every period has the same shape unless the bounds truncated differently somewhere, then use the cached template
+
+        template = None
+        if self.numper > 0 and float(self.ticksinper).is_integer():
+            periodic = np.arange(self.numper) * int(self.ticksinper)
+            if np.array_equal(lb - lb[0], periodic) and np.array_equal(ub - ub[0], periodic):
+                template = _transit_template(int(self.ticksinper), self.duration, self.slopelength)
+        return lb, ub, depths, first, last, noise, template
+
+    def _fill_window(self, timesteps, flux, start, plan):
+        """
+        Writes one window of the light curve in place. Windows have to be written in order when fluxOG is not cached,
+        since the noise is then drawn on the fly
+
+        Args:
+            timesteps (array): Buffer for the timesteps of the window
+            flux (array): Buffer for the flux of the window
+            start (integer): Index of the first sample of the window in the whole light curve
+            plan (tuple): Transits found by self._window_plan
 
-            #generates SHAPE of transit around period = 0.5 for each period.
+        """
+
+        lb, ub, depths, first, last, noise, template = plan
+        stop = start + len(flux)
+        np.divide(np.arange(start, stop), self.ticksinper, out = timesteps)
+        with _stage("noise"):
+            if noise is None:
+                np.take(self._fluxOG, np.arange(start - self.location, stop - self.location), mode = 'wrap', out = flux)
+            else:
+                flux[...] = _baseline(noise, self.noise, len(flux))
+            flux -= 1
+
+        #periods touching the window, either directly or after wrapping around: transits can run past the end of the
+        #light curve, or start before it when the ingress of the first period is longer than the location shift
+
+        with _stage("inject"):
+            periods = np.unique(np.concatenate([np.arange(np.searchsorted(last, start + wrap, side = 'right'),
+                                                          np.searchsorted(first, stop + wrap))
+                                                for wrap in (-self.length, 0, self.length)]))
+            if template is not None:
+                _inject_template(flux, template, periods * int(self.ticksinper), depths[periods],
+                                 shift = self.location, start = start, length = self.length)
+            else:
+                _inject_transits(flux, lb[periods], ub[periods], self.slopelength, depths[periods],
+                                 shift = self.location, start = start, length = self.length)
+
+    def _transit_plan(self):
+        """
+        Finds the bounds and depth of the transit in every period and updates the period counter and depth
+
+        Returns:
+            array: Lower bound of the transit in each period, before the location shift
+            array: Upper bound of the transit in each period, before the location shift
+            array: Depth of the transit in each period
+
+        """
+
+        #generates SHAPE of transit around period = 0.5 for every period at once.
+
+        lb, ub = _transit_bounds(self.ticksinper, self.duration, self.numper)
+        depths = _depth_sequence(self.depth, self.numper, self.rng)
+
+        if self.numper > 0:
+            self.lb = int(lb[-1])
+            self.ub = int(ub[-1])
+        self.per = self.numper
+        self.depth = depths[-1]
+
+        return lb, ub, depths[:-1]
+
+    def transit_indices(self):
+        """
+        Lists the samples the transits were injected into, from self.transits, without scanning the flux
 
-            lowerbound = int(self.ticksinper/2 * (1 + 2 *self.per) - self.duration/2)
-            upperbound = int(self.ticksinper/2 * (1 + 2 *self.per) + self.duration/2)
+        Returns:
+            array: Sorted indices of every in-transit sample of the last generated light curve
+
+        """
+
+        starts, stops = self.transits.T
+        return _ragged_arange(starts, stops - starts)[0]
 
-            self.ub = int(upperbound)
-            self.lb = int(lowerbound) 
+    def in_transit(self, indices):
+        """
+        Looks up whether samples are in transit with a binary search over self.transits
+
+        Args:
+            indices (integer or array): Indices of samples of the last generated light curve
 
-            self.flux[self.lb:self.ub] -= self.depth
+        Returns:
+            Bool or array: True for the samples inside an injected transit
 
-            for i in np.arange(self.lb - self.slopelength, self.lb):
-                self.flux[i] = 1 - (i - (self.lb - self.slopelength))/(self.slopelength) * (self.depth)
-            for i in np.arange(self.ub, self.slopelength + self.ub):
-                self.flux[i] = 1 + (i - (self.ub + self.slopelength))/(self.slopelength) * (self.depth)
+        """
 
-            self.per += 1
-            self.depth = np.random.normal(loc=self.depth, scale = 0.0001, size = 1)[0]
+        starts, stops = self.transits.T
+        if len(starts) == 0:
+            return np.zeros(np.shape(indices), dtype = bool) if np.ndim(indices) else False
+        i = np.searchsorted(starts, indices, side = 'right') - 1
+        return (i >= 0) & (indices < stops[np.maximum(i, 0)])
 
-        #Shifts the transits to where location tells them to go
+    def plot_transit(self, phase_flag = False, xlim = [], filename = None, decimate = False):
+        """ 
+        Subtracts transit from the flux and plots the resulting lightcurve
+        
+        Args:
+            phase_flag (Bool, default = False): Decides if graph plotted is phasefolded or not
+            xlim (array): Limits for the x axis sent to the self.plot
+            filename (string, default = None): Memory-mapped .npy file to write the light curve into, see self.generate
+            decimate (Bool or integer, default = False): Draws the min and max of every pixel column, see self.plot
+        Returns:
+            array: Timesteps to plot lightcurve
+            array: Flux for plotted lightcurve
 
-        self.flux = np.roll(self.flux,self.location)
+        """
 
-        self.plot(phase_flag, xlim = xlim)
-        self.timesteps = np.arange(self.ticksinper*self.per)/self.ticksinper
+        self.generate(filename = filename)
+        self.plot(phase_flag, xlim = xlim, decimate = decimate)
 
         return self.timesteps, self.flux
 
-    def plot(self, phase_flag = False, xlim = [0,0]):
+    @_staged("plot")
+    def plot(self, phase_flag = False, xlim = [], decimate = False):
         """
         Plots the light curve including the transit, then updates the period counter
 
         Args:
             phase_flag (Bool, default = False): Decides if plot is phasefolded or not.
             xlim (array): Limits for the x axis sent to the self.plot
+            decimate (Bool or integer, default = False): Instead of every sample, draws the min and max of the light
+                curve and of the transits in every pixel column of the figure, or in this many columns if an integer.
+                Looks the same as the full scatter plot, keeps every transit dip exact and draws at most a few points
+                per column however long the light curve is
 
 
         """
 
-        plt.figure()
-        transit_idxs = np.where(self.flux<.995)[0] #Pulls indices where transit occurs after the shift
+        #pyplot is only imported here so that generating curves never loads the plotting stack
 
-        if phase_flag == True:
-            plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper % 1, self.flux, color = 'deepskyblue', label = "Light Curve")
-            plt.scatter(transit_idxs/self.ticksinper % 1, self.flux[transit_idxs], color = 'navy', label = "Transit")
-            plt.xlabel("Phase")
+        import matplotlib.pyplot as plt
+
+        if not isinstance(decimate, bool) and decimate < 1:
+            raise Exception("ValueError: decimate must be True, False or a number of columns of at least 1.")
+
+        plt.figure()
+        if decimate is not False:
+            if decimate is True:
+                decimate = int(plt.gcf().get_figwidth() * plt.gcf().dpi)
+            with _stage("decimate"):
+                envelopes = self.envelope(decimate, phase_flag = phase_flag, xlim = xlim)
+            with _stage("scatter"):
+                for (x, low, high), color, label in zip(envelopes, ('deepskyblue', 'navy'), ("Light Curve", "Transit")):
+                    plt.vlines(x, low, high, color = color)
+                    plt.scatter(np.concatenate((x, x)), np.concatenate((low, high)), color = color, s = 4, label = label)
+            plt.xlabel("Phase" if phase_flag == True else "Period")
 
         else:
-            plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper, self.flux, color = 'deepskyblue', label = "Light Curve")
-            plt.scatter(transit_idxs/self.ticksinper, self.flux[transit_idxs], color = 'navy', label = "Transit")
-            plt.xlabel("Period")
+            with _stage("transits"):
+                transit_idxs = self.transit_indices() #Pulls indices where transit occurs after the shift
+
+            if phase_flag == True:
+                with _stage("scatter"):
+                    plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper % 1, self.flux, color = 'deepskyblue', label = "Light Curve")
+                    plt.scatter(transit_idxs/self.ticksinper % 1, self.flux[transit_idxs], color = 'navy', label = "Transit")
+                plt.xlabel("Phase")
+
+            else:
+                with _stage("scatter"):
+                    plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper, self.flux, color = 'deepskyblue', label = "Light Curve")
+                    plt.scatter(transit_idxs/self.ticksinper, self.flux[transit_idxs], color = 'navy', label = "Transit")
+                plt.xlabel("Period")
 
         if len(xlim) != 0: #Applies x limit
             plt.xlim(xlim[0],xlim[1])
@@ -130,8 +928,233 @@ class LightCurveTheoretical(object):
         plt.title("Generated Light Curve of " + f"{self.name}")
         plt.legend()
 
+    def envelope(self, columns, phase_flag = False, xlim = []):
+        """
+        Reduces the light curve and its transits to their min and max in every column of the x axis, as drawn by
+        self.plot(decimate = ...). The samples inside xlim are found from xlim * ticksinper, without building the
+        timesteps, and read from the coarsest level of a min/max pyramid that still resolves the columns, so zooming
+        costs about the number of columns however long the light curve is. The pyramid is built once per generated
+        light curve, on first use
+
+        Args:
+            columns (integer): Number of columns across the x axis
+            phase_flag (Bool, default = False): Folds every period onto one before reducing, xlim is then ignored
+            xlim (array, default = []): Limits of the x axis, only the samples inside them are reduced
+
+        Returns:
+            tuple: Center, min and max of every column of the light curve
+            tuple: Center, min and max of every column holding a transit sample
+
+        """
+
+        if columns < 1:
+            raise Exception("ValueError: columns must be at least 1.")
+
+        if phase_flag == True:
+
+            #folds with one reduction over the periods, then the columns split the phase
+
+            ticks = int(self.ticksinper)
+            folded = self.flux[:self.per * ticks].reshape(-1, ticks)
+            transit_idxs = self.transit_indices()
+            transit_low = np.full(ticks, np.inf)
+            transit_high = np.full(ticks, -np.inf)
+            np.minimum.at(transit_low, transit_idxs % ticks, self.flux[transit_idxs])
+            np.maximum.at(transit_high, transit_idxs % ticks, self.flux[transit_idxs])
+            light, transit = self._columns((folded.min(axis = 0), folded.max(axis = 0), transit_low, transit_high),
+                                           0, 1, 0, ticks, columns)
+
+        else:
+            first, stop = 0, len(self.flux)
+            if len(xlim) != 0:
+                first = _timestep_index(len(self.flux), self.ticksinper, xlim[0], side = 'left')
+                stop = max(first, _timestep_index(len(self.flux), self.ticksinper, xlim[1], side = 'right'))
+
+            #coarsest level with at least two blocks per column, so some whole blocks always fall inside xlim
+
+            levels = self._minmax_levels()
+            k = 0
+            while k < len(levels) and _PYRAMID_BLOCK * 4**k * 2 * columns <= stop - first:
+                k += 1
+            block = _PYRAMID_BLOCK * 4**(k - 1) if k else 1
+            b0, b1 = -(-first // block), stop // block
+            if k:
+                blocks = [a[b0:b1] for a in levels[k - 1]]
+            else:
+                blocks = self._masked(first, stop)
+            light, transit = self._columns(blocks, b0 * block, block, first, stop, columns)
+
+            #samples of the blocks cut by xlim join the first and last columns
+
+            for (start, end), i in (((first, b0 * block), 0), ((b1 * block, stop), -1)):
+                if k and end > start:
+                    part = self._masked(start, end)
+                    for column, low, high in ((light, part[0], part[1]), (transit, part[2], part[3])):
+                        column[1][i] = min(column[1][i], low.min())
+                        column[2][i] = max(column[2][i], high.max())
+
+        hit = np.isfinite(transit[1])
+        return light, tuple(a[hit] for a in transit)
+
+    def _masked(self, start, stop):
+        """
+        Reads a range of the flux for self.envelope, with the samples out of transit masked for the transit envelope
+
+        Args:
+            start (integer): Index of the first sample
+            stop (integer): Index one past the last sample
+
+        Returns:
+            tuple: Flux twice, then the flux with inf and -inf out of transit, for the min and the max
+
+        """
+
+        flux = self.flux[start:stop]
+
+        #the disjoint intervals inside the range mark their edges, a cumulative sum then fills them in
+
+        intervals = self.transits[np.searchsorted(self.transits[:, 1], start, side = 'right'):
+                                  np.searchsorted(self.transits[:, 0], stop)]
+        intervals = np.clip(intervals - start, 0, stop - start)
+        intervals = intervals[intervals[:, 1] > intervals[:, 0]]
+        edges = np.zeros(stop - start + 1, dtype = np.int8)
+        edges[intervals[:, 0]] += 1
+        edges[intervals[:, 1]] -= 1
+        mask = np.cumsum(edges[:-1], dtype = np.int8) > 0
+        return flux, flux, np.where(mask, flux, np.inf), np.where(mask, flux, -np.inf)
+
+    def _minmax_levels(self):
+        """
+        Builds the min/max pyramids of the flux and of its transits once per generated light curve, for self.envelope.
+        Blocks start at _PYRAMID_BLOCK samples, so the pyramids hold about a third as many values as the flux, and
+        views too narrow for them read the flux directly
+
+        Returns:
+            list of tuple: Min and max of the flux, then of its transit samples, in blocks of _PYRAMID_BLOCK * 4**k
+            samples at level k
+
+        """
+
+        if self._pyramid is None:
+
+            #the masked flux is only made a chunk at a time and reduced straight into the first level
 
-class LightCurveExoplanet(object):
+            chunks = []
+            for start in range(0, len(self.flux), _PYRAMID_BLOCK * 4**6):
+                chunk = self._masked(start, min(start + _PYRAMID_BLOCK * 4**6, len(self.flux)))
+                starts = np.arange(0, len(chunk[0]), _PYRAMID_BLOCK)
+                chunks.append([reduce.reduceat(a, starts) for reduce, a in zip((np.minimum, np.maximum) * 2, chunk)])
+            levels = []
+            if chunks:
+                low, high, transit_low, transit_high = [np.concatenate(a) for a in zip(*chunks)]
+                levels = [f + t for f, t in zip([(low, high)] + _minmax_pyramid(low, high),
+                                                [(transit_low, transit_high)] + _minmax_pyramid(transit_low, transit_high))]
+            self._pyramid = levels
+        return self._pyramid
+
+    def _columns(self, blocks, start, block, first, stop, columns):
+        """
+        Reduces per-block min and max arrays into columns, for self.envelope
+
+        Args:
+            blocks (tuple): Min and max of every block of the flux, then of its transit samples
+            start (integer): Index of the first sample of the first block
+            block (integer): Number of samples in each block
+            first (integer): Index of the first sample of the first column, at most start
+            stop (integer): Index one past the last sample of the last column
+            columns (integer): Number of columns across the x axis
+
+        Returns:
+            tuple: Center, min and max of every column of the light curve
+            tuple: Center, min and max of every column of the transits, inf where a column has no transit sample
+
+        """
+
+        n = len(blocks[0])
+        if n == 0:
+            empty = (np.empty(0), np.empty(0), np.empty(0))
+            return empty, empty
+        columns = max(1, min(int(columns), n))
+        starts = np.arange(columns) * n // columns
+        edges = start + starts * block
+        edges[0] = first
+        x = (edges + np.append(edges[1:], stop) - 1)/2/self.ticksinper
+        low, high, transit_low, transit_high = [reduce.reduceat(a, starts).astype(float) for reduce, a in
+                                                zip((np.minimum, np.maximum) * 2, blocks)]
+        return (x, low, high), (x, transit_low, transit_high)
+
+
+class LightCurveTheoretical(_LightCurve):
+    """
+        Light Curve with transit details for one period, for theoretical transit details
+
+        Args:
+            ticksinper (integer): Number of timesteps in a single period
+            depth (float): Depth of transit to be simulated
+            duration (float): Fraction of one period for planet to be in transit
+            noise (float): Noise to be added to the flux
+            numper (integer): Number of periods to be simulated
+            name (string): Name of the object, sent to self.plot
+            seed (integer, SeedSequence or Generator, default = None): Seed of every random number of the light curve
+            dtype (dtype, default = np.float64): Floating point type of the noise baseline and flux. np.float32 halves
+                the memory, and the flux then agrees with the float64 curve of the same seed to within 1e-6
+        
+
+        Attributes:
+            ticksinper (integer): Number of timesteps in one period
+            length (integer): Number of total timesteps
+            depth (float): Depth of simulated transit
+            duration (float): Time length of simulated transit
+            noise (float): Normalized noise to be added to flux
+            location (float): Central location of transit
+            fluxOG (array): Flux of the lightcurve to be stored in order to remake light curves. Generated from
+                noise_seed on first access and cached, can be replaced by a custom baseline
+            noise_seed (integer): Seed of the noise in fluxOG
+            dtype (dtype): Floating point type of fluxOG and flux, timesteps stay float64 to resolve every tick
+            per (integer): current number of period being simulated
+            numper (integer): The total number of periods to be simulated
+            slopelength (integer): Duration of which to have sloped part of transit
+            name (string): Name of object to be passed to self.plot
+            flux (array): Flux to be plotted on the light curve. Is reset each time plot_transit is called to preserve depth
+            lb (integer): Found lower bound for transit 
+            ub (integer): Found upper bound for transit
+            transits (array): Start and stop (exclusive) of every in-transit interval of the generated light curve
+                after the location shift, with shape (n_intervals, 2). Transits wrapped around the end are split in two
+            rng (Generator): Source of every random number of the light curve, never the global np.random state
+            seed (integer or SeedSequence): Seed to pass back in to regenerate the light curve exactly, None if a
+                Generator was given
+            
+    """
+
+    @_staged("__init__")
+    def __init__(self, ticksinper = 100, depth = 0, duration = 0, noise = .001, numper = 1, name = "", seed = None,
+                 dtype = np.float64):
+        
+        #sets intiial parameters, randomizes uninputted ones
+
+        self.rng, self.seed = _seeded_rng(seed)
+        self.dtype = np.dtype(dtype)
+        self.ticksinper = ticksinper
+        self.length = self.ticksinper * numper
+        if depth == 0:
+            self.depth = self.rng.uniform(.01,.20)
+        else:
+            self.depth = depth
+        if duration == 0:
+            self.duration = self.rng.integers(.02 * ticksinper, .15 * ticksinper)
+        else:
+            self.duration = duration * ticksinper
+        self.noise = noise
+        self.location = self.rng.integers(0,ticksinper)
+        self.noise_seed = int(self.rng.integers(2**63))
+        self._fluxOG = None
+        self.per = 0
+        self.numper = numper
+        self.slopelength = int(self.duration/10)
+        self.name = name
+
+
+class LightCurveExoplanet(_LightCurve):
     """
         Light Curve with transit details for one period, for theoretical transit details
 
@@ -142,6 +1165,9 @@ class LightCurveExoplanet(object):
             noise (float): Noise to be added to the flux
             numper (integer): Number of periods to be simulated
             name (string): Name of system to be passed to self.plot
+            seed (integer, SeedSequence or Generator, default = None): Seed of every random number of the light curve
+            dtype (dtype, default = np.float64): Floating point type of the noise baseline and flux. np.float32 halves
+                the memory, and the flux then agrees with the float64 curve of the same seed to within 1e-6
         
 
         Attributes:
@@ -151,7 +1177,10 @@ class LightCurveExoplanet(object):
             duration (float): Time length of simulated transit
             noise (float): Normalized noise to be added to flux
             location (float): Central location of transit
-            fluxOG (array): Flux of the lightcurve to be stored in order to remake light curves
+            fluxOG (array): Flux of the lightcurve to be stored in order to remake light curves. Generated from
+                noise_seed on first access and cached, can be replaced by a custom baseline
+            noise_seed (integer): Seed of the noise in fluxOG
+            dtype (dtype): Floating point type of fluxOG and flux, timesteps stay float64 to resolve every tick
             per (integer): current number of period being simulated
             numper (integer): The total number of periods to be simulated
             slopelength (integer): Duration of which to have sloped part of transit
@@ -159,10 +1188,17 @@ class LightCurveExoplanet(object):
             flux (array): Flux to be plotted on the light curve. Is reset each time plot_transit is called to preserve depth
             lb (integer): Found lower bound for transit 
             ub (integer): Found upper bound for transit
+            transits (array): Start and stop (exclusive) of every in-transit interval of the generated light curve
+                after the location shift, with shape (n_intervals, 2). Transits wrapped around the end are split in two
+            rng (Generator): Source of every random number of the light curve, never the global np.random state
+            seed (integer or SeedSequence): Seed to pass back in to regenerate the light curve exactly, None if a
+                Generator was given
 
     """
 
-    def __init__(self, planet, star, ticksinper = 100, noise = .001, numper = 1, name = ""):
+    @_staged("__init__")
+    def __init__(self, planet, star, ticksinper = 100, noise = .001, numper = 1, name = "", seed = None,
+                 dtype = np.float64):
         """
         Light Curve with transit details for one period for exoplanet and star system. Calculates transit parameters from system 
         parameters.
@@ -179,138 +1215,163 @@ class LightCurveExoplanet(object):
         location (0 < float < 1.0): central location of transit
         flux (array of floats): normalized flux of light curve
         numper (integer): number of periods
+        seed (integer, SeedSequence or Generator): seed of every random number of the light curve
+        dtype (dtype): floating point type of the flux
 
         """
 
         #Calculates the initial parameters from the inputted system
 
+        self.rng, self.seed = _seeded_rng(seed)
+        self.dtype = np.dtype(dtype)
         self.ticksinper = ticksinper
         self.length = self.ticksinper * numper
-        self.depth = float(((planet.radius / star.radius).to(''))**2)
-        self.duration = float((star.radius/(planet.a * 2 * np.pi)).to('') * self.ticksinper)
+        self.depth = float((planet.radius_m / star.radius_m)**2)
+        self.duration = float(star.radius_m/(planet.a_m * 2 * np.pi) * self.ticksinper)
         self.noise = noise
-        self.location = np.random.randint(0,ticksinper)
-        self.fluxOG = np.ones(self.length) + np.random.normal(loc = 0, scale = self.noise, size = self.length)+1
+        self.location = self.rng.integers(0,ticksinper)
+        self.noise_seed = int(self.rng.integers(2**63))
+        self._fluxOG = None
         self.per = 0
         self.slopelength = int(self.duration/10)
         self.numper = numper
         self.name = name
+
+
+class Exoplanet(object):
+
+    """
+    Simulated exoplanet
+    Args:
+        rad (float): radius of exoplanet in jupiter masses
+        a (float): semi-major axis of exoplanet in AU
+        rad_unit (string, default = R_J): unit of inputted radius
+        a_unit (string, default = AU): unit of inputted semi-major axis
+
+    Attributes:
+        radius (float): Planetary radius in units rad_unit, as an astropy Quantity built on access. Can be assigned
+        a (float): semi-major axis in units a_unit, as an astropy Quantity built on access. Can be assigned
+        radius_m (float): Planetary radius in meters, as a plain float that follows radius
+        a_m (float): semi-major axis in meters, as a plain float that follows a
     
-    def plot_transit(self, phase_flag = False, xlim = []):
-        """ 
-        Subtracts transit from the flux and plots the resulting lightcurve
+    """
+
+    #plain SI floats so light curves never do Quantity arithmetic
+
+    radius = _LazyQuantity("_rad", "_rad_unit")
+    a = _LazyQuantity("_a", "_a_unit")
+    radius_m = _InMeters("_rad", "_rad_unit")
+    a_m = _InMeters("_a", "_a_unit")
+
+    def __init__(self, rad, a, rad_unit = "R_J", a_unit = "AU"):
         
-        Args:
-            phase_flag (Bool, default = False): Decides if graph plotted is phasefolded or not
-        Returns:
-            array: Timesteps to plot lightcurve
-            array: Flux for plotted lightcurve
+        self._rad = rad
+        self._rad_unit = _length_unit(rad_unit, _RAD_UNITS, "rad_unit")
+        self._a = a
+        self._a_unit = _length_unit(a_unit, _A_UNITS, "a_unit")
+        #self.mass = mass * u.M_jup
 
-        """
+class Star(object):
+    """
+    Simulated Star
+    
+    Args:
+        rad (float): radius of star in R_sun
 
-        self.per = 0
-        self.flux = self.fluxOG - 1
-        while self.per < self.numper:
+    Attributes:
+        radius (float): radius of star in solar radii, as an astropy Quantity built on access. Can be assigned
+        radius_m (float): radius of star in meters, as a plain float that follows radius
+    """
+
+    radius = _LazyQuantity("_rad", "_rad_unit")
+    radius_m = _InMeters("_rad", "_rad_unit")
+
+    def __init__(self, rad):
+        self._rad = rad
+        self._rad_unit = "R_sun"
 
-            #generates SHAPE of transit around period = 0.5 for each period.
 
-            lowerbound = int(self.ticksinper/2 * (1 + 2 *self.per) - self.duration/2)
-            upperbound = int(self.ticksinper/2 * (1 + 2 *self.per) + self.duration/2)
+class PlanetCatalog(object):
+    """
+    Catalog of simulated exoplanets stored as arrays, for simulating whole populations without one Exoplanet per
+    planet. Units work as in Exoplanet.
 
-            self.ub = int(upperbound)
-            self.lb = int(lowerbound) 
+    Args:
+        rad (array): radii of the exoplanets in units rad_unit
+        a (array): semi-major axes of the exoplanets in units a_unit
+        rad_unit (string, default = R_J): unit of inputted radii
+        a_unit (string, default = AU): unit of inputted semi-major axes
 
-            self.flux[self.lb:self.ub] -= self.depth
+    Attributes:
+        radius (Quantity array): Planetary radii in units rad_unit, built on access
+        a (Quantity array): semi-major axes in units a_unit, built on access
+        radius_m (array): Planetary radii in meters
+        a_m (array): semi-major axes in meters
 
-            for i in np.arange(self.lb - self.slopelength, self.lb):
-                self.flux[i] = 1 - (i - (self.lb - self.slopelength))/(self.slopelength) * (self.depth)
-            for i in np.arange(self.ub, self.slopelength + self.ub):
-                self.flux[i] = 1 + (i - (self.ub + self.slopelength))/(self.slopelength) * (self.depth)
+    """
 
-            self.per += 1
-            self.depth = np.random.normal(loc=self.depth, scale = 0.0001, size = 1)[0]
-        
-        #Shifts the transits to where location tells them to go
-       
-        self.flux = np.roll(self.flux,self.location)
+    radius = _LazyQuantity("_rad", "_rad_unit")
+    a = _LazyQuantity("_a", "_a_unit")
+    radius_m = _InMeters("_rad", "_rad_unit")
+    a_m = _InMeters("_a", "_a_unit")
 
-        self.plot(phase_flag, xlim = xlim)
-        self.timesteps = np.arange(self.ticksinper*self.per)/self.ticksinper
-        return self.timesteps, self.flux
+    def __init__(self, rad, a, rad_unit = "R_J", a_unit = "AU"):
+        self._rad, self._a = np.broadcast_arrays(np.atleast_1d(np.asarray(rad, dtype = float)),
+                                                 np.asarray(a, dtype = float))
+        self._rad_unit = _length_unit(rad_unit, _RAD_UNITS, "rad_unit")
+        self._a_unit = _length_unit(a_unit, _A_UNITS, "a_unit")
 
-    def plot(self, phase_flag = False, xlim = []):
+    def __len__(self):
+        return len(self.radius_m)
+
+    def depths(self, stars):
         """
-        Plots the light curve including the transit, then updates the period counter
+        Calculates the transit depth of every planet via d = {R_p^2}/{R_s^2}
 
         Args:
-            phase_flag (Bool, default = False): Decides if plot is phasefolded or not.
+            stars (StarCatalog or Star): host star of each planet, or one star for all of them
+
+        Returns:
+            array: Depth of the transit of each planet
 
         """
 
-        plt.figure()
-        transit_idxs = np.where(self.flux<.995)[0]
-        if phase_flag == True:
-            plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper % 1, self.flux, color = 'deepskyblue', label = "Light Curve")
-            plt.scatter(transit_idxs/self.ticksinper % 1, self.flux[transit_idxs], color = 'navy', label = "Transit")
-            plt.xlabel("Phase")
+        return (self.radius_m / stars.radius_m)**2
 
-        else:
-            plt.scatter(np.arange(self.ticksinper*self.per)/self.ticksinper, self.flux, color = 'deepskyblue', label = "Light Curve")
-            plt.scatter(transit_idxs/self.ticksinper, self.flux[transit_idxs], color = 'navy', label = "Transit")
-            plt.xlabel("Period")
+    def durations(self, stars, ticksinper = 1):
+        """
+        Calculates the transit duration of every planet via t/P = R_s/(2*pi*a)
 
-        if len(xlim) != 0:
-            plt.xlim(xlim[0],xlim[1])
-        
-        plt.ylabel("Normalized Flux")
-        plt.title("Generated Light Curve of " + f"{self.name}")
-        plt.legend()
+        Args:
+            stars (StarCatalog or Star): host star of each planet, or one star for all of them
+            ticksinper (integer, default = 1): Number of timesteps in one period. The default gives the fraction of
+                a period, as taken by TransitPopulation
 
+        Returns:
+            array: Duration of the transit of each planet
 
-class Exoplanet(object):
+        """
 
-    """
-    Simulated exoplanet
-    Args:
-        rad (float): radius of exoplanet in jupiter masses
-        a (float): semi-major axis of exoplanet in AU
-        rad_unit (string, default = R_J): unit of inputted radius
-        a_unit (string, default = AU): unit of inputted semi-major axis
+        return stars.radius_m/(self.a_m * 2 * np.pi) * ticksinper
 
-    Attributes:
-        radius (float): Planetary radius in units rad_unit
-        a (float): semi-major axis in units a_unit
-    
+class StarCatalog(object):
     """
+    Catalog of simulated stars stored as an array
 
-    def __init__(self, rad, a, rad_unit = "R_J", a_unit = "AU"):
-        
-        if rad_unit == "R_J":
-            self.radius = rad * u.R_jup
-        elif rad_unit == "R_earth":
-            self.radius = rad * u.R_earth
-        elif rad_unit == "m":
-            self. radius == rad * u.m
-        else: 
-            raise Exception("ValueError: rad_unit must be 'R_J', 'R_earth', or 'm'.")
-        if a_unit == "AU":
-            self.a = a * u.au
-        elif a_unit == "m":
-            self.a = a * u.m
-        else:
-            raise Exception("ValueError: a_unit must be either 'AU' or 'm'.")
-        #self.mass = mass * u.M_jup
-
-class Star(object):
-    """
-    Simulated Star
-    
     Args:
-        rad (float): radius of star in R_sun
+        rad (array): radii of the stars in R_sun
 
     Attributes:
-        radius (float): radius of star in solar radii.
+        radius (Quantity array): radii of the stars in solar radii, built on access
+        radius_m (array): radii of the stars in meters
     """
 
+    radius = _LazyQuantity("_rad", "_rad_unit")
+    radius_m = _InMeters("_rad", "_rad_unit")
+
     def __init__(self, rad):
-        self.radius = rad * u.R_sun
\ No newline at end of file
+        self._rad = np.atleast_1d(np.asarray(rad, dtype = float))
+        self._rad_unit = "R_sun"
+
+    def __len__(self):
+        return len(self.radius_m)
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .phasefold import _phase_bins
+
+class BLSResult(object):
+    """
+        Result of a Box Least Squares search, as returned by bls_search. For a light curve of lcEnhance the timesteps
+        are in periods, so a detection of lc should have period close to 1, phase close to
+        (.5 + lc.location/lc.ticksinper) % 1, duration close to lc.duration/lc.ticksinper and depth close to lc.depth.
+
+        Args:
+            periods (array): Trial periods
+            power (array): Best power found at each trial period
+            phases (array): Phase of the center of the best box at each trial period
+            durations (array): Duration of the best box at each trial period, in the units of timesteps
+            depths (array): Depth of the best box at each trial period
+
+        Attributes:
+            periods (array): Trial periods
+            power (array): Best power found at each trial period, the periodogram
+            period (float): Period with the highest power
+            phase (float): Phase of the center of the transit, from 0 to 1 with phase 0 at timestep 0
+            duration (float): Duration of the transit, in the units of timesteps
+            depth (float): Depth of the transit, mean flux out of transit minus mean flux in transit
+
+    """
+
+    def __init__(self, periods, power, phases, durations, depths):
+        self.periods = periods
+        self.power = power
+        best = int(np.argmax(power))
+        self.period = float(periods[best])
+        self.phase = float(phases[best])
+        self.duration = float(durations[best])
+        self.depth = float(depths[best])
+
+    def plot(self):
+        """
+        Plots the power of every trial period and marks the best one
+
+        """
+
+        import matplotlib.pyplot as plt
+
+        plt.figure()
+        plt.plot(self.periods, self.power, color = 'deepskyblue', label = "Power")
+        plt.axvline(self.period, color = 'navy', linestyle = '--', label = f"Best period {self.period:.5g}")
+        plt.xlabel("Period")
+        plt.ylabel("BLS Power")
+        plt.title("Box Least Squares Periodogram")
+        plt.legend()
+
+def _search_period(timesteps, flux, period, widths, bins):
+    """
+    Finds the best box at one trial period. The folded flux is binned with np.bincount, then cumulative sums over the
+    bins, repeated once to wrap around phase 1, give the sum and count in every box of every width at once
+
+    Args:
+        timesteps (array): Timesteps of the light curve
+        flux (array): Flux of the light curve minus its mean
+        period (float): Trial period
+        widths (array): Box widths to try, in bins
+        bins (integer): Number of phase bins
+
+    Returns:
+        tuple: Power, phase of the box center, duration and depth of the best box
+
+    """
+
+    idx = _phase_bins(timesteps, bins, period, 0)
+    count = np.bincount(idx, minlength = bins)
+    total = np.bincount(idx, weights = flux, minlength = bins)
+    n = len(flux)
+
+    wrap = widths.max()
+    count = np.concatenate(([0], np.cumsum(np.concatenate((count, count[:wrap])))))
+    total = np.concatenate(([0], np.cumsum(np.concatenate((total, total[:wrap])))))
+    starts = np.arange(bins)
+    n_in = count[starts + widths[:, None]] - count[starts]
+    s_in = total[starts + widths[:, None]] - total[starts]
+
+    #flux has zero mean, so the fit of a box improves the squared residuals by s_in**2 * n/(n_in * (n - n_in));
+    #only dips count as transits
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        power = np.where((n_in > 0) & (n_in < n) & (s_in < 0), s_in * s_in * n/(n_in * (n - n_in)), 0)
+    w, start = np.unravel_index(np.argmax(power), power.shape)
+    if power[w, start] == 0:
+        return 0., 0., 0., 0.
+    depth = -s_in[w, start] * n/(n_in[w, start] * (n - n_in[w, start]))
+    return (power[w, start], ((start + widths[w]/2)/bins) % 1, widths[w]/bins * period, depth)
+
+def bls_search(timesteps, flux, periods, durations = None, bins = 200, max_duration = .2, threads = None):
+    """
+    Searches a light curve for periodic box-shaped transits with Box Least Squares. Each trial period costs one
+    np.bincount pass over the samples plus a cumulative sum over the phase bins, so O(N), and the trial periods are
+    spread over a thread pool since NumPy releases the GIL in its loops
+
+    Args:
+        timesteps (array): Timesteps of the light curve, as returned by plot_transit or generate
+        flux (array): Flux of the light curve
+        periods (array): Trial periods, in the units of timesteps
+        durations (array, default = None): Trial durations as fractions of the period, like the duration argument
+            of LightCurveTheoretical. Every whole number of bins up to max_duration if not given
+        bins (integer, default = 200): Number of phase bins, the resolution of the phase and duration
+        max_duration (float, default = .2): Longest trial duration as a fraction of the period, when durations is
+            not given
+        threads (integer, default = None): Number of threads, defaults to the number of cores
+
+    Returns:
+        BLSResult: Periodogram and best transit
+
+    """
+
+    timesteps = np.asarray(timesteps, dtype = float)
+    flux = np.asarray(flux, dtype = float)
+    flux = flux - flux.mean()
+    periods = np.atleast_1d(np.asarray(periods, dtype = float))
+    if len(periods) == 0:
+        raise Exception("ValueError: periods must hold at least one trial period.")
+    if durations is None:
+        durations = np.arange(1, int(max_duration * bins) + 1)/bins
+    widths = np.unique(np.clip(np.rint(np.asarray(durations) * bins).astype(int), 1, bins - 1))
+
+    with ThreadPoolExecutor(max_workers = threads) as pool:
+        results = list(pool.map(lambda period: _search_period(timesteps, flux, period, widths, bins), periods))
+    power, phases, found, depths = (np.array(a) for a in zip(*results))
+    return BLSResult(periods, power, phases, found, depths)
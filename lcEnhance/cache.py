@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .LCE import _transit_bounds, _transit_intervals
+
+class LightCurveCache(object):
+    """
+        On-disk cache of generated light curves. A curve is keyed on a stable hash of everything its generation
+        depends on, including the state of its random generator, so a repeat request is a file read instead of a
+        re-simulation. The least recently used curves are evicted once the cache grows past max_bytes.
+
+        Args:
+            directory (string): Directory holding the cached curves, created if missing
+            max_bytes (integer, default = 2**30): Size limit of the cache
+
+        Attributes:
+            directory (string): Directory holding the cached curves
+            max_bytes (integer): Size limit of the cache
+            hits (integer): Number of curves read from the cache
+            misses (integer): Number of curves simulated and stored
+
+    """
+
+    def __init__(self, directory, max_bytes = 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok = True)
+
+    def key(self, lc):
+        """
+        Finds the cache key of a light curve
+
+        Args:
+            lc (LightCurveTheoretical or LightCurveExoplanet): Light curve about to be generated
+
+        Returns:
+            string: Hex digest of the generation parameters
+
+        """
+
+        params = {
+            "class": type(lc).__name__,
+            "ticksinper": int(lc.ticksinper),
+            "numper": int(lc.numper),
+            "depth": float(lc.depth),
+            "duration": float(lc.duration),
+            "slopelength": int(lc.slopelength),
+            "noise": float(lc.noise),
+            "location": int(lc.location),
+            "noise_seed": int(lc.noise_seed),
+            "dtype": lc.dtype.str,
+            "rng": lc.rng.bit_generator.state,
+        }
+
+        #a cached or custom baseline replaces the seeded noise, so its contents are part of the key
+
+        if lc._fluxOG is not None:
+            params["baseline"] = hashlib.sha256(np.ascontiguousarray(lc._fluxOG)).hexdigest()
+
+        text = json.dumps(params, sort_keys = True, default = lambda o: np.asarray(o).tolist())
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def generate(self, lc):
+        """
+        Generates a light curve like lc.generate(), reading it from the cache when it is there. On a hit the light
+        curve is left in the same state as if it had been generated, including its depth and random generator.
+
+        Args:
+            lc (LightCurveTheoretical or LightCurveExoplanet): Light curve to generate
+
+        Returns:
+            array: Timesteps of the lightcurve
+            array: Flux of the lightcurve
+
+        """
+
+        path = os.path.join(self.directory, self.key(lc) + ".npz")
+        try:
+            with np.load(path) as entry:
+                flux = entry["flux"]
+                depth = float(entry["depth"])
+                state = json.loads(str(entry["rng"]))
+        except (OSError, KeyError, ValueError):
+            self.misses += 1
+            timesteps, flux = lc.generate()
+            self._store(path, flux, lc)
+            return timesteps, flux
+
+        self.hits += 1
+        os.utime(path)
+        lb, ub = _transit_bounds(lc.ticksinper, lc.duration, lc.numper)
+        if lc.numper > 0:
+            lc.lb = int(lb[-1])
+            lc.ub = int(ub[-1])
+        lc.transits = _transit_intervals(lb - lc.slopelength + lc.location, ub + lc.slopelength + lc.location,
+                                         lc.length)
+        lc.per = lc.numper
+        lc.depth = depth
+        lc.rng.bit_generator.state = state
+        lc.flux = flux
+        lc._pyramid = None
+        lc.timesteps = np.arange(lc.length)/lc.ticksinper
+        return lc.timesteps, lc.flux
+
+    def clear(self):
+        """
+        Removes every cached curve
+
+        """
+
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+
+    def _store(self, path, flux, lc):
+        #written to a temporary file first so concurrent jobs never read half a curve
+
+        fd, tmp = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, flux = flux, depth = lc.depth,
+                     rng = json.dumps(lc.rng.bit_generator.state, default = lambda o: np.asarray(o).tolist()))
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        #least recently used first, hits refresh the modification time
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
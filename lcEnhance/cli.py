@@ -0,0 +1,174 @@
+"""
+Command line batch generator of light curves.
+
+    lcenhance generate spec.json --output run1 --processes 8
+
+The spec is a JSON file listing groups of curves, each group using the arguments of LightCurveTheoretical or
+LightCurveExoplanet:
+
+    {
+        "seed": 42,
+        "dtype": "float32",
+        "curves": [
+            {"kind": "theoretical", "count": 1000, "ticksinper": 1000, "numper": 10, "noise": 0.001},
+            {"kind": "exoplanet", "count": 10, "planet": {"rad": 1, "a": 0.05}, "star": {"rad": 1}, "numper": 5}
+        ]
+    }
+
+The output directory gets flux.npy, every curve concatenated into one memory-mappable array, and curves.npy, one
+metadata record per curve (offset and length in flux.npy, depth, duration, location, seed, ...). Every curve gets
+its own seed spawned from the spec seed, so the output does not depend on the number of processes, and any curve
+can be regenerated exactly from its record.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import LCE as lce
+
+METADATA = np.dtype([("kind", "U11"), ("name", "U64"), ("offset", np.int64), ("length", np.int64),
+                     ("ticksinper", np.int64), ("numper", np.int64), ("depth", np.float64),
+                     ("duration", np.float64), ("slopelength", np.int64), ("noise", np.float64),
+                     ("location", np.int64), ("seed", np.uint64)])
+
+def expand_spec(spec):
+    """
+    Lists every curve of a spec
+
+    Args:
+        spec (dict): Parsed spec file
+
+    Returns:
+        list of dict: Arguments of each curve, with its kind
+
+    """
+
+    curves = []
+    for group in spec["curves"]:
+        group = dict(group)
+        count = group.pop("count", 1)
+        if group.get("kind", "theoretical") not in ("theoretical", "exoplanet"):
+            raise Exception("ValueError: kind must be either 'theoretical' or 'exoplanet'.")
+        curves.extend([group] * count)
+    return curves
+
+def make_curve(entry, seed, dtype):
+    """
+    Builds the light curve described by one entry of a spec
+
+    Args:
+        entry (dict): Arguments of the curve, with its kind
+        seed (integer): Seed of the curve
+        dtype (dtype): Floating point type of the flux
+
+    Returns:
+        LightCurveTheoretical or LightCurveExoplanet: The light curve, not generated yet
+
+    """
+
+    kwargs = {k: v for k, v in entry.items() if k not in ("kind", "planet", "star")}
+    if entry.get("kind", "theoretical") == "exoplanet":
+        return lce.LightCurveExoplanet(lce.Exoplanet(**entry["planet"]), lce.Star(**entry["star"]), seed = seed,
+                                       dtype = dtype, **kwargs)
+    return lce.LightCurveTheoretical(seed = seed, dtype = dtype, **kwargs)
+
+def _generate_curve(args):
+    #runs in a worker process: generates one curve straight into its slice of flux.npy, the flux slice is then the
+    #only full-length array, as generate(out = ...) does not store the timesteps
+
+    entry, seed, dtype, filename, offset = args
+    lc = make_curve(entry, seed, dtype)
+    record = (entry.get("kind", "theoretical"), lc.name, offset, lc.length, lc.ticksinper, lc.numper, lc.depth,
+              lc.duration, lc.slopelength, lc.noise, lc.location, seed)
+    flux = np.load(filename, mmap_mode = "r+")
+    lc.generate(out = flux[offset:offset + lc.length])
+    flux.flush()
+    return record
+
+def generate(spec, output, processes = None, dtype = None, progress = sys.stderr):
+    """
+    Generates every curve of a spec in parallel and writes them to an output directory
+
+    Args:
+        spec (dict): Parsed spec file
+        output (string): Output directory, created if missing
+        processes (integer, default = None): Number of worker processes, defaults to the number of cores
+        dtype (string, default = None): Floating point type of the flux, overrides the one in the spec
+        progress (file, default = sys.stderr): Where to report throughput, None for silence
+
+    Returns:
+        array: Metadata record of every curve
+
+    """
+
+    curves = expand_spec(spec)
+    dtype = np.dtype(dtype or spec.get("dtype", "float64"))
+    seeds = [int(s.generate_state(1, np.uint64)[0]) for s in np.random.SeedSequence(spec.get("seed")).spawn(len(curves))]
+
+    #lengths are known up front, so the flux file is allocated once and every worker writes its own slice
+
+    lengths = np.array([c.get("ticksinper", 100) * c.get("numper", 1) for c in curves], dtype = np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    os.makedirs(output, exist_ok = True)
+    filename = os.path.join(output, "flux.npy")
+    np.lib.format.open_memmap(filename, mode = "w+", dtype = dtype, shape = (int(lengths.sum()),)).flush()
+
+    metadata = np.empty(len(curves), dtype = METADATA)
+    start = time.perf_counter()
+    tasks = [(c, s, dtype, filename, int(o)) for c, s, o in zip(curves, seeds, offsets)]
+    with ProcessPoolExecutor(max_workers = processes) as pool:
+        for i, record in enumerate(pool.map(_generate_curve, tasks, chunksize = max(1, len(tasks) // 256))):
+            metadata[i] = record
+            if progress is not None and (i + 1) % 1000 == 0:
+                print(f"{i + 1}/{len(curves)} curves", file = progress)
+    np.save(os.path.join(output, "curves.npy"), metadata)
+
+    if progress is not None:
+        seconds = time.perf_counter() - start
+        samples = int(lengths.sum())
+        print(f"{len(curves)} curves, {samples} samples in {seconds:.2f} s: {len(curves) / seconds:.1f} curves/s, "
+              f"{samples / seconds:.3g} samples/s, {samples * dtype.itemsize / seconds / 2**20:.1f} MiB/s",
+              file = progress)
+    return metadata
+
+def read_batch(output):
+    """
+    Opens the output of generate without reading the flux into memory
+
+    Args:
+        output (string): Output directory
+
+    Returns:
+        array: Metadata record of every curve
+        memmap: Flux of every curve concatenated, curve i is flux[offset:offset + length] of record i
+
+    """
+
+    return np.load(os.path.join(output, "curves.npy")), np.load(os.path.join(output, "flux.npy"), mmap_mode = "r")
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "lcenhance", description = __doc__,
+                                     formatter_class = argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest = "command", required = True)
+    gen = commands.add_parser("generate", help = "generate the light curves of a spec file")
+    gen.add_argument("spec", help = "JSON spec file")
+    gen.add_argument("--output", "-o", required = True, help = "output directory")
+    gen.add_argument("--processes", "-p", type = int, default = None, help = "worker processes, default all cores")
+    gen.add_argument("--dtype", default = None, help = "flux dtype, overrides the spec")
+    gen.add_argument("--quiet", "-q", action = "store_true", help = "do not report throughput")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    generate(spec, args.output, processes = args.processes, dtype = args.dtype,
+             progress = None if args.quiet else sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import numpy as np
+
+def _pyarrow():
+    #pyarrow is optional, only the export needs it
+
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("lcEnhance.export needs pyarrow, install it with pip install lcEnhance[arrow]") from e
+    return pyarrow
+
+def flux_table(flux, offsets = None, **columns):
+    """
+    Builds an Arrow table with one row per light curve. The flux becomes a fixed-size list column when every curve
+    has the same length, otherwise a list column over offsets. Both wrap the numpy buffer without copying it.
+
+    Args:
+        flux (array): Flux matrix with shape (n_curves, length), or every curve concatenated when offsets is given
+        offsets (array, default = None): Start of each curve in flux followed by the total length, for ragged curves
+        **columns (array): Scalar parameter of each curve, one column each
+
+    Returns:
+        Table: Flux column followed by the parameter columns
+
+    """
+
+    pa = _pyarrow()
+    flux = np.ascontiguousarray(flux)
+    if offsets is None:
+        values = pa.array(flux.reshape(-1))
+        flux = pa.FixedSizeListArray.from_arrays(values, flux.shape[1])
+    else:
+        offsets = np.asarray(offsets, dtype = np.int64)
+        lengths = np.diff(offsets)
+        values = pa.array(flux[offsets[0]:offsets[-1]])
+        if len(lengths) and (lengths == lengths[0]).all():
+            flux = pa.FixedSizeListArray.from_arrays(values, int(lengths[0]))
+        else:
+            flux = pa.LargeListArray.from_arrays(pa.array(offsets - offsets[0]), values)
+    return pa.table({"flux": flux, **{k: pa.array(np.asarray(v)) for k, v in columns.items()}})
+
+def population_table(population):
+    """
+    Builds an Arrow table from a generated TransitPopulation
+
+    Args:
+        population (TransitPopulation): Population after generate
+
+    Returns:
+        Table: Flux and parameters of every system, ticksinper and numper are stored in the schema metadata
+
+    """
+
+    table = flux_table(population.flux, depth = population.depths, duration = population.durations,
+                       slopelength = population.slopelengths, noise = population.noises,
+                       location = population.locations)
+    return table.replace_schema_metadata({"ticksinper": str(population.ticksinper),
+                                          "numper": str(population.numper)})
+
+def batch_table(output):
+    """
+    Builds an Arrow table from the output directory of lcenhance generate, without reading the flux into memory
+
+    Args:
+        output (string): Output directory of lcenhance generate
+
+    Returns:
+        Table: Flux and metadata record of every curve
+
+    """
+
+    from .cli import read_batch
+
+    metadata, flux = read_batch(output)
+    offsets = np.append(metadata["offset"], metadata["offset"][-1] + metadata["length"][-1]) if len(metadata) else [0]
+    return flux_table(flux, offsets = offsets, **{k: metadata[k] for k in metadata.dtype.names
+                                                  if k not in ("offset", "length")})
+
+def write(table, filename, row_group_size = 1024):
+    """
+    Writes a table to a Parquet file, or to an Arrow IPC file when filename ends with .arrow or .feather
+
+    Args:
+        table (Table): Table to write
+        filename (string): Output file
+        row_group_size (integer, default = 1024): Curves per Parquet row group, the unit read back by read
+
+    """
+
+    pa = _pyarrow()
+    if filename.endswith((".arrow", ".feather")):
+        with pa.OSFile(filename, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize = row_group_size)
+    else:
+        pa.parquet.write_table(table, filename, row_group_size = row_group_size)
+
+def _row_indices(rows, count):
+    #rows as int64 indices, negative ones counted from the end like numpy
+
+    rows = np.asarray(rows, dtype = np.int64).reshape(-1)
+    if np.any((rows < -count) | (rows >= count)):
+        raise Exception("ValueError: rows must be between " + f"{-count} and {count - 1}.")
+    return np.where(rows < 0, rows + count, rows)
+
+def read(filename, rows = None, columns = None):
+    """
+    Reads some curves and columns back. Arrow IPC files are memory mapped and every run of consecutive rows is a
+    slice of the file, so the result points into it without copies. Parquet files only decode the requested columns
+    of the row groups holding the requested rows, then copy the rows out of them.
+
+    Args:
+        filename (string): File written by write
+        rows (array, default = None): Indices of the curves to read, negative ones counting from the end, all of
+            them if not given
+        columns (list of string, default = None): Columns to read, all of them if not given
+
+    Returns:
+        Table: Requested curves and columns
+
+    """
+
+    pa = _pyarrow()
+    if filename.endswith((".arrow", ".feather")):
+        table = pa.ipc.open_file(pa.memory_map(filename, "r")).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        if rows is None:
+            return table
+
+        #runs of consecutive rows become slices of the mapped file, take would copy them
+
+        rows = _row_indices(rows, table.num_rows)
+        if len(rows) == 0:
+            return table.slice(0, 0)
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [len(rows)]))
+        return pa.concat_tables([table.slice(int(rows[a]), int(b - a)) for a, b in zip(starts, stops)])
+
+    f = pa.parquet.ParquetFile(filename)
+    if rows is None:
+        return f.read(columns = columns)
+
+    #row groups holding the rows, then the position of each row among the row groups actually read
+
+    rows = _row_indices(rows, f.metadata.num_rows)
+    if len(rows) == 0:
+        return f.schema_arrow.empty_table().select(columns if columns is not None else f.schema_arrow.names)
+    sizes = np.array([f.metadata.row_group(i).num_rows for i in range(f.num_row_groups)])
+    starts = np.cumsum(sizes) - sizes
+    group = np.searchsorted(starts, rows, side = "right") - 1
+    groups = np.unique(group)
+    table = f.read_row_groups(groups.tolist(), columns = columns)
+    base = np.cumsum(sizes[groups]) - sizes[groups]
+    return table.take(base[np.searchsorted(groups, group)] + rows - starts[group])
+
+def flux_matrix(table):
+    """
+    Views the flux column of a table as a numpy matrix, without copying when the column is a single chunk
+
+    Args:
+        table (Table): Table with a fixed-size list flux column
+
+    Returns:
+        array: Flux matrix with shape (n_curves, length)
+
+    """
+
+    flux = table.column("flux")
+    flux = flux.chunk(0) if flux.num_chunks == 1 else flux.combine_chunks()
+    return flux.flatten().to_numpy().reshape(len(flux), flux.type.list_size)
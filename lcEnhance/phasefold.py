@@ -0,0 +1,217 @@
+import numpy as np
+
+def _phase_bins(timesteps, bins, period, epoch):
+    #bin of every sample, the last bin also takes the rounding of phases just below 1
+
+    phase = np.asarray(timesteps, dtype = float) - epoch
+    phase /= period
+    phase %= 1
+    phase *= bins
+    return np.minimum(phase.astype(np.intp), bins - 1)
+
+class PhaseProfile(object):
+    """
+        Phase-folded light curve binned in phase, as returned by phase_fold. Its size only depends on the number of
+        bins, however many periods were folded.
+
+        Args:
+            count (array): Number of samples in each bin
+            mean (array): Mean flux of each bin, nan for empty bins
+            std (array): Standard deviation of the flux in each bin, nan for empty bins
+            median (array, default = None): Median flux of each bin, nan for empty bins
+
+        Attributes:
+            bins (integer): Number of phase bins
+            phase (array): Phase at the center of each bin
+            count (array): Number of samples in each bin
+            mean (array): Mean flux of each bin
+            std (array): Standard deviation of the flux in each bin
+            median (array): Median flux of each bin, None unless it was asked for
+
+    """
+
+    def __init__(self, count, mean, std, median = None):
+        self.bins = len(count)
+        self.phase = (np.arange(self.bins) + .5)/self.bins
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.median = median
+
+    def plot(self, name = "", errors = True):
+        """
+        Plots the mean flux of every bin against phase
+
+        Args:
+            name (string, default = ""): Name of the object, for the title
+            errors (Bool, default = True): Draws the standard error of the mean of every bin as error bars
+
+        """
+
+        import matplotlib.pyplot as plt
+
+        plt.figure()
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            yerr = self.std/np.sqrt(self.count) if errors else None
+        plt.errorbar(self.phase, self.mean, yerr = yerr, fmt = 'o', markersize = 3, color = 'navy', label = "Mean")
+        if self.median is not None:
+            plt.scatter(self.phase, self.median, s = 6, color = 'deepskyblue', label = "Median", zorder = 3)
+        plt.xlabel("Phase")
+        plt.ylabel("Normalized Flux")
+        plt.title("Phase-folded Light Curve of " + f"{name}")
+        plt.legend()
+
+def phase_fold(timesteps, flux, bins = 100, period = 1, epoch = 0, median = False):
+    """
+    Folds a light curve at a period and bins it in phase. The mean, standard deviation and count take two
+    np.bincount passes over the samples, so the cost is linear in the number of samples
+
+    Args:
+        timesteps (array): Timesteps of the light curve, in periods for the light curves of lcEnhance
+        flux (array): Flux of the light curve
+        bins (integer, default = 100): Number of phase bins
+        period (float, default = 1): Folding period, in the units of timesteps
+        epoch (float, default = 0): Timestep at phase 0
+        median (Bool, default = False): Also finds the median of every bin, which needs a sort of the samples
+
+    Returns:
+        PhaseProfile: Binned profile
+
+    """
+
+    flux = np.asarray(flux)
+    idx = _phase_bins(timesteps, bins, period, epoch)
+    count = np.bincount(idx, minlength = bins)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        mean = np.bincount(idx, weights = flux, minlength = bins)/count
+
+        #deviations from the bin mean rather than sums of squares, which cancel badly around a flux of 1
+
+        deviation = flux - mean[idx]
+        std = np.sqrt(np.bincount(idx, weights = deviation * deviation, minlength = bins)/count)
+
+    medians = None
+    if median:
+        medians = np.full(bins, np.nan)
+        if len(flux):
+
+            #sorted by bin then flux, the middle samples of each bin sit between its offset and the next one
+
+            ordered = flux[np.lexsort((flux, idx))].astype(float)
+            starts = np.cumsum(count) - count
+            full = count > 0
+            medians[full] = (ordered[(starts + (count - 1)//2)[full]] + ordered[(starts + count//2)[full]])/2
+    return PhaseProfile(count, mean, std, medians)
+
+class PhaseFoldAccumulator(object):
+    """
+        Phase fold built a chunk of flux at a time, for light curves too long to hold in memory. Keeps the count, mean
+        and sum of squared deviations of every bin, so its memory only depends on the number of bins. Each chunk is
+        reduced with np.bincount and merged into the bins with the pairwise form of Welford's update (Chan et al.),
+        which is as stable as updating sample by sample.
+
+        Args:
+            bins (integer, default = 100): Number of phase bins
+            period (float, default = 1): Folding period, in the units of timesteps. The timesteps of the light curves
+                of lcEnhance are in periods, so the default folds at ticksinper samples
+            epoch (float, default = 0): Timestep at phase 0
+
+        Attributes:
+            bins (integer): Number of phase bins
+            period (float): Folding period
+            epoch (float): Timestep at phase 0
+            count (array): Number of samples in each bin so far
+            mean (array): Mean flux of each bin so far, nan for empty bins
+            m2 (array): Sum of squared deviations from the mean of each bin so far
+
+        Example:
+
+            accumulator = PhaseFoldAccumulator(bins = 200)
+            for timesteps, flux in lc.stream():
+                accumulator.update(timesteps, flux)
+            profile = accumulator.profile()
+
+    """
+
+    def __init__(self, bins = 100, period = 1, epoch = 0):
+        self.bins = bins
+        self.period = period
+        self.epoch = epoch
+        self.count = np.zeros(bins, dtype = np.int64)
+        self.mean = np.full(bins, np.nan)
+        self.m2 = np.zeros(bins)
+
+    def update(self, timesteps, flux):
+        """
+        Adds a chunk of the light curve
+
+        Args:
+            timesteps (array): Timesteps of the chunk
+            flux (array): Flux of the chunk
+
+        """
+
+        flux = np.asarray(flux)
+        idx = _phase_bins(timesteps, self.bins, self.period, self.epoch)
+        count = np.bincount(idx, minlength = self.bins)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            mean = np.bincount(idx, weights = flux, minlength = self.bins)/count
+        deviation = flux - mean[idx]
+        self._merge(count, mean, np.bincount(idx, weights = deviation * deviation, minlength = self.bins))
+
+    def merge(self, other):
+        """
+        Adds every sample seen by another accumulator with the same bins, so chunks can be folded in parallel
+
+        Args:
+            other (PhaseFoldAccumulator): Accumulator to add
+
+        """
+
+        if (other.bins, other.period, other.epoch) != (self.bins, self.period, self.epoch):
+            raise Exception("ValueError: accumulators must have the same bins, period and epoch.")
+        self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, count, mean, m2):
+        #pairwise Welford update, bins that are empty on either side just take the other side
+
+        total = self.count + count
+        full = count > 0
+        old = full & (self.count > 0)
+        delta = mean - self.mean
+        self.mean[full] = np.where(old, self.mean + delta * (count/np.maximum(total, 1)), mean)[full]
+        self.m2[full] = np.where(old, self.m2 + m2 + delta * delta * (self.count * (count/np.maximum(total, 1))),
+                                 m2)[full]
+        self.count = total
+
+    def profile(self):
+        """
+        Finds the binned profile of every sample added so far
+
+        Returns:
+            PhaseProfile: Binned profile, the same as phase_fold on the whole light curve, without the median
+
+        """
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            std = np.sqrt(self.m2/self.count)
+        return PhaseProfile(self.count.copy(), self.mean.copy(), std)
+
+def stream_fold(lc, bins = 100, chunksize = 100000):
+    """
+    Folds a light curve at its own period while streaming it, never holding more than one chunk of flux
+
+    Args:
+        lc (LightCurveTheoretical or LightCurveExoplanet): Light curve to fold, see its stream method
+        bins (integer, default = 100): Number of phase bins
+        chunksize (integer, default = 100000): Number of timesteps in each chunk
+
+    Returns:
+        PhaseProfile: Binned profile
+
+    """
+
+    accumulator = PhaseFoldAccumulator(bins = bins)
+    for timesteps, flux in lc.stream(chunksize = chunksize):
+        accumulator.update(timesteps, flux)
+    return accumulator.profile()
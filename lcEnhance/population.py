@@ -0,0 +1,169 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .LCE import _transit_bounds, _depth_sequence, _inject_transits
+
+class TransitPopulation(object):
+    """
+        Population of light curves simulated in one vectorized pass, one row of the flux matrix per system.
+        Uses the same trapezoid transit as LightCurveTheoretical and LightCurveExoplanet.
+
+        Args:
+            depths (array): Depth of the transit of each system
+            durations (array): Fraction of one period each system is in transit
+            locations (array, default = None): Central location of each transit in timesteps, randomized if not given
+            noises (float or array, default = .001): Noise to be added to the flux of each system
+            ticksinper (integer): Number of timesteps in a single period, shared by every system
+            numper (integer): Number of periods to be simulated, shared by every system
+            seed (integer, Generator or list of SeedSequence, default = None): Seed of the random numbers used by the
+                population. A list gives every system its own independent stream
+
+        Attributes:
+            n_systems (integer): Number of simulated systems
+            ticksinper (integer): Number of timesteps in one period
+            length (integer): Number of total timesteps of each light curve
+            depths (array): Depth of the transit of each system in the first period
+            durations (array): Time length of the transit of each system in timesteps
+            slopelengths (array): Duration of the sloped part of each transit
+            noises (array): Normalized noise to be added to the flux of each system
+            locations (array): Central location of the transit of each system
+            numper (integer): The total number of periods to be simulated
+            rng (Generator or _SystemStreams): Source of every random number of the population
+            timesteps (array): Timesteps shared by every light curve, set by self.generate
+            flux (array): Flux matrix with shape (n_systems, length), set by self.generate
+
+    """
+
+    def __init__(self, depths, durations, locations = None, noises = .001, ticksinper = 100, numper = 1, seed = None):
+
+        if isinstance(seed, (list, tuple)):
+            self.rng = _SystemStreams(seed)
+        else:
+            self.rng = np.random.default_rng(seed)
+        self.depths = np.atleast_1d(np.asarray(depths, dtype = float))
+        self.n_systems = len(self.depths)
+        self.ticksinper = ticksinper
+        self.numper = numper
+        self.length = self.ticksinper * numper
+        self.durations = np.broadcast_to(durations, self.depths.shape) * ticksinper
+        self.slopelengths = (self.durations/10).astype(int)
+        self.noises = np.broadcast_to(np.asarray(noises, dtype = float), self.depths.shape)
+        if locations is None:
+            self.locations = self.rng.integers(0, ticksinper, size = self.n_systems)
+        else:
+            self.locations = np.broadcast_to(np.asarray(locations, dtype = int), self.depths.shape)
+
+    def generate(self):
+        """
+        Simulates the light curve of every system at once
+
+        Returns:
+            array: Timesteps shared by every light curve
+            array: Flux matrix with shape (n_systems, length)
+
+        """
+
+        #noise is drawn straight into the shifted frame, so the transits are written where np.roll would put them
+
+        self.flux = self.rng.standard_normal((self.n_systems, self.length))
+        self.flux *= self.noises[:, None]
+        self.flux += 1
+
+        lb, ub = _transit_bounds(self.ticksinper, self.durations, self.numper)
+        depths = _depth_sequence(self.depths, self.numper, rng = self.rng)
+        _inject_transits(self.flux, lb, ub, self.slopelengths[:, None], depths[:, :-1], shift = self.locations[:, None])
+
+        self.timesteps = np.arange(self.length)/self.ticksinper
+        return self.timesteps, self.flux
+
+
+class _SystemStreams(object):
+    """
+        Independent random generators, one per system, used in place of a single Generator by TransitPopulation.
+        Every system draws from its own stream, so its light curve does not depend on the batch it is simulated in.
+
+        Args:
+            seeds (list of SeedSequence): Seed of each system
+
+        Attributes:
+            generators (list of Generator): Generator of each system
+
+    """
+
+    def __init__(self, seeds):
+        self.generators = [np.random.default_rng(s) for s in seeds]
+
+    def integers(self, low, high, size):
+        return np.array([g.integers(low, high) for g in self.generators])
+
+    def standard_normal(self, size):
+        out = np.empty(size)
+        for row, g in zip(out, self.generators):
+            g.standard_normal(out = row)
+        return out
+
+    def normal(self, loc, scale, size):
+        out = np.empty(size)
+        for row, g in zip(out, self.generators):
+            row[...] = g.normal(loc = loc, scale = scale, size = size[1:])
+        return out
+
+
+def _simulate_batch(args):
+    #runs in a worker process, so it has to be a module level function
+
+    depths, durations, locations, noises, ticksinper, numper, seeds = args
+    population = TransitPopulation(depths, durations, locations = locations, noises = noises,
+                                   ticksinper = ticksinper, numper = numper, seed = seeds)
+    population.generate()
+    return population.locations, population.flux
+
+def simulate_population(depths, durations, locations = None, noises = .001, ticksinper = 100, numper = 1, seed = None,
+                        processes = None, batch_size = 1024):
+    """
+    Simulates a population of light curves in parallel on a process pool. Every system gets its own Generator spawned
+    from one SeedSequence, so the result is the same for any number of processes and any batch size.
+
+    Args:
+        depths (array): Depth of the transit of each system
+        durations (array): Fraction of one period each system is in transit
+        locations (array, default = None): Central location of each transit in timesteps, randomized if not given
+        noises (float or array, default = .001): Noise to be added to the flux of each system
+        ticksinper (integer): Number of timesteps in a single period, shared by every system
+        numper (integer): Number of periods to be simulated, shared by every system
+        seed (integer or SeedSequence, default = None): Root seed of the whole population
+        processes (integer, default = None): Number of worker processes, defaults to the number of cores
+        batch_size (integer, default = 1024): Number of systems simulated by a worker at a time
+
+    Returns:
+        array: Timesteps shared by every light curve
+        array: Flux matrix with shape (n_systems, length)
+        array: Central location of the transit of each system
+
+    """
+
+    depths = np.atleast_1d(np.asarray(depths, dtype = float))
+    n_systems = len(depths)
+    durations = np.broadcast_to(durations, depths.shape)
+    noises = np.broadcast_to(noises, depths.shape)
+    if locations is not None:
+        locations = np.broadcast_to(locations, depths.shape)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(n_systems)
+
+    batches = []
+    for start in range(0, n_systems, batch_size):
+        sl = slice(start, start + batch_size)
+        batches.append((depths[sl], durations[sl], None if locations is None else locations[sl], noises[sl],
+                        ticksinper, numper, seeds[sl]))
+
+    flux = np.empty((n_systems, ticksinper * numper))
+    all_locations = np.empty(n_systems, dtype = int)
+    with ProcessPoolExecutor(max_workers = processes) as pool:
+        for start, (batch_locations, batch_flux) in zip(range(0, n_systems, batch_size), pool.map(_simulate_batch, batches)):
+            flux[start:start + len(batch_flux)] = batch_flux
+            all_locations[start:start + len(batch_flux)] = batch_locations
+
+    return np.arange(ticksinper * numper)/ticksinper, flux, all_locations